@@ -6,17 +6,16 @@ Converts YOLO PyTorch models to CoreML format for macOS integration
 
 import sys
 import os
+import importlib.util
 from pathlib import Path
 
 def check_dependencies():
-    """Check if required packages are installed"""
+    """Check if required packages are installed (without importing them)"""
     required = ['ultralytics', 'coremltools', 'torch']
     missing = []
 
     for package in required:
-        try:
-            __import__(package)
-        except ImportError:
+        if importlib.util.find_spec(package) is None:
             missing.append(package)
 
     if missing:
@@ -26,7 +25,92 @@ def check_dependencies():
         return False
     return True
 
-def convert_yolo_to_coreml(model_path, output_dir=None, img_size=640, include_nms=True):
+PRECISIONS = ('fp16', 'fp32')
+QUANTIZATIONS = ('none', 'int8')
+EXPORT_CACHE_DIR = Path.home() / ".cache" / "eyetracking" / "coreml"
+
+def pop_flag(argv, name):
+    """Remove '--name value' or '--name=value' from argv and return the value"""
+    for i, arg in enumerate(argv):
+        if arg == name and i + 1 < len(argv):
+            value = argv[i + 1]
+            del argv[i:i + 2]
+            return value
+        if arg.startswith(name + '='):
+            del argv[i]
+            return arg.split('=', 1)[1]
+    return None
+
+def copy_mlpackage(src, dest):
+    """
+    Copy an .mlpackage directory, using an APFS clone when possible
+
+    On macOS `cp -c` uses clonefile(2), which creates a copy-on-write clone
+    without copying any data. Falls back to shutil.copytree elsewhere or when
+    cloning is not supported (e.g. non-APFS volumes).
+    """
+    import shutil
+    import subprocess
+
+    if sys.platform == 'darwin':
+        if dest.exists():
+            shutil.rmtree(dest)
+        result = subprocess.run(['cp', '-cR', str(src), str(dest)], capture_output=True)
+        if result.returncode == 0:
+            return
+        if dest.exists():
+            shutil.rmtree(dest)
+
+    shutil.copytree(src, dest, dirs_exist_ok=True)
+
+def check_static_input(mlpackage_path, img_size):
+    """Warn if the exported model's image input is not fixed to img_size x img_size"""
+    import coremltools as ct
+
+    spec = ct.models.MLModel(str(mlpackage_path), skip_model_load=True).get_spec()
+    for model_input in spec.description.input:
+        if model_input.type.WhichOneof('Type') != 'imageType':
+            continue
+        image_type = model_input.type.imageType
+        if image_type.WhichOneof('SizeFlexibility') is not None:
+            print(f"Warning: input '{model_input.name}' has a flexible shape; "
+                  f"Core ML cannot specialize it at compile time")
+        elif (image_type.width, image_type.height) != (img_size, img_size):
+            print(f"Warning: input '{model_input.name}' is {image_type.width}x{image_type.height}, "
+                  f"expected {img_size}x{img_size}")
+        else:
+            print(f"✓ Static input '{model_input.name}': {img_size}x{img_size}")
+
+def export_cache_path(model_path, img_size, include_nms, precision, quantize):
+    """
+    Return the cache location for an exported .mlpackage
+
+    The key covers the model weights (SHA256), every export option and the
+    installed ultralytics/coremltools versions, so any change forces a re-export.
+    """
+    import hashlib
+    from importlib.metadata import version, PackageNotFoundError
+
+    sha256 = hashlib.sha256()
+    with open(model_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha256.update(block)
+
+    versions = []
+    for package in ('ultralytics', 'coremltools'):
+        try:
+            versions.append(version(package))
+        except PackageNotFoundError:
+            versions.append('none')
+
+    key = '_'.join([
+        sha256.hexdigest()[:16], str(img_size), 'nms' if include_nms else 'nonms',
+        precision, quantize, *versions,
+    ])
+    return EXPORT_CACHE_DIR / key / f"{Path(model_path).stem}.mlpackage"
+
+def convert_yolo_to_coreml(model_path, output_dir=None, img_size=640, include_nms=True,
+                           precision='fp16', quantize='none', use_cache=True):
     """
     Convert YOLO model to CoreML format
 
@@ -35,9 +119,10 @@ def convert_yolo_to_coreml(model_path, output_dir=None, img_size=640, include_nm
         output_dir: Output directory (default: same as model_path)
         img_size: Input image size (default: 640)
         include_nms: Include NMS in model (default: True)
+        precision: Weight/compute precision, 'fp16' (default, ANE-friendly) or 'fp32'
+        quantize: Weight compression, 'none' (default) or 'int8' (kmeans palettization)
+        use_cache: Reuse a previous export with identical inputs (default: True)
     """
-    from ultralytics import YOLO
-
     model_path = Path(model_path)
     if not model_path.exists():
         print(f"Error: Model file not found: {model_path}")
@@ -49,28 +134,59 @@ def convert_yolo_to_coreml(model_path, output_dir=None, img_size=640, include_nm
         output_dir = Path(output_dir)
         output_dir.mkdir(parents=True, exist_ok=True)
 
-    print(f"Loading YOLO model from: {model_path}")
-    try:
-        model = YOLO(str(model_path))
-    except Exception as e:
-        print(f"Error loading model: {e}")
-        return False
+    # Get the model name
+    model_name = model_path.stem
+    mlpackage_path = model_path.parent / f"{model_name}.mlpackage"
+
+    cache_path = None
+    if use_cache:
+        cache_path = export_cache_path(model_path, img_size, include_nms, precision, quantize)
 
-    print(f"Converting to CoreML (img_size={img_size}, nms={include_nms})...")
     try:
-        # Export to CoreML
-        # The export function will create the .mlpackage file
-        export_path = model.export(
-            format='coreml',
-            imgsz=img_size,
-            nms=include_nms,
-            half=False,  # Don't use FP16 for better compatibility
-        )
-        print(f"✓ Successfully exported to: {export_path}")
-
-        # Get the model name
-        model_name = model_path.stem
-        mlpackage_path = model_path.parent / f"{model_name}.mlpackage"
+        if cache_path is not None and cache_path.exists():
+            # Tracing and conversion are skipped entirely on a hit
+            print(f"✓ Export cache hit: {cache_path}")
+            copy_mlpackage(cache_path, mlpackage_path)
+        else:
+            if cache_path is not None:
+                print(f"Export cache miss: {cache_path.parent.name}")
+
+            # Imported only once the inputs are valid; ultralytics pulls in torch
+            from ultralytics import YOLO
+
+            print(f"Loading YOLO model from: {model_path}")
+            try:
+                model = YOLO(str(model_path))
+            except Exception as e:
+                print(f"Error loading model: {e}")
+                return False
+
+            print(f"Converting to CoreML (img_size={img_size}, nms={include_nms}, precision={precision}, "
+                  f"quantize={quantize})...")
+            # Export to CoreML
+            # The export function will create the .mlpackage file
+            export_path = model.export(
+                format='coreml',
+                imgsz=img_size,
+                nms=include_nms,
+                # FP16 is required for Neural Engine dispatch; fp32 is kept as a
+                # fallback for models that lose accuracy at half precision
+                half=(precision == 'fp16'),
+                # Fixed input shape lets the Core ML compiler specialize layers
+                # and ANE tiling at compile time instead of at load time
+                dynamic=False,
+                # INT8 kmeans palettization is applied by the exporter before it
+                # wraps the model in the NMS pipeline; coremltools.optimize only
+                # accepts a bare mlprogram, not the finished pipeline
+                int8=(quantize == 'int8'),
+            )
+            print(f"✓ Successfully exported to: {export_path}")
+            check_static_input(export_path, img_size)
+
+            if cache_path is not None:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                copy_mlpackage(Path(export_path), cache_path)
+                print(f"✓ Cached export at: {cache_path}")
 
         if mlpackage_path.exists():
             print(f"✓ CoreML model package created: {mlpackage_path}")
@@ -78,10 +194,9 @@ def convert_yolo_to_coreml(model_path, output_dir=None, img_size=640, include_nm
             # Copy to Flutter app Resources directory
             flutter_resources = Path("/Users/huilinzhu/Projects/EyeTracking/flutter_app/macos/Runner/Resources")
             if flutter_resources.exists():
-                import shutil
                 dest = flutter_resources / mlpackage_path.name
                 print(f"\nCopying to Flutter app...")
-                shutil.copytree(mlpackage_path, dest, dirs_exist_ok=True)
+                copy_mlpackage(mlpackage_path, dest)
                 print(f"✓ Copied to: {dest}")
             else:
                 print(f"\nNote: Flutter Resources directory not found at: {flutter_resources}")
@@ -96,25 +211,48 @@ def convert_yolo_to_coreml(model_path, output_dir=None, img_size=640, include_nm
         return False
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python3 convert_yolo_to_coreml.py <model.pt> [output_dir] [img_size]")
+    args = sys.argv[1:]
+    precision_flag = pop_flag(args, '--precision')
+    quantize = (pop_flag(args, '--quantize') or 'none').lower()
+    use_cache = '--no-cache' not in args
+    args = [arg for arg in args if arg != '--no-cache']
+
+    if len(args) < 1:
+        print("Usage: python3 convert_yolo_to_coreml.py <model.pt> [output_dir] [img_size] [precision]")
+        print("       precision: fp16 (default) or fp32, also accepted as --precision")
+        print("       --quantize int8: palettize weights to 8 bits during export")
+        print("       --no-cache: re-export even if an identical export is cached")
         print("\nExample:")
         print("  python3 convert_yolo_to_coreml.py yolo12m.pt")
         print("  python3 convert_yolo_to_coreml.py yolo12m.pt /path/to/output 320")
+        print("  python3 convert_yolo_to_coreml.py yolo12m.pt --precision fp32")
+        print("  python3 convert_yolo_to_coreml.py yolo12m.pt --quantize int8")
         sys.exit(1)
 
     if not check_dependencies():
         sys.exit(1)
 
-    model_path = sys.argv[1]
-    output_dir = sys.argv[2] if len(sys.argv) > 2 else None
-    img_size = int(sys.argv[3]) if len(sys.argv) > 3 else 640
+    model_path = args[0]
+    output_dir = args[1] if len(args) > 1 else None
+    img_size = int(args[2]) if len(args) > 2 else 640
+    precision = precision_flag or (args[3] if len(args) > 3 else 'fp16')
+    precision = precision.lower()
+
+    if precision not in PRECISIONS:
+        print(f"Error: Invalid precision '{precision}' (expected one of: {', '.join(PRECISIONS)})")
+        sys.exit(1)
+
+    if quantize not in QUANTIZATIONS:
+        print(f"Error: Invalid quantization '{quantize}' (expected one of: {', '.join(QUANTIZATIONS)})")
+        sys.exit(1)
 
     print("="*60)
     print("YOLO to CoreML Conversion")
     print("="*60)
 
-    success = convert_yolo_to_coreml(model_path, output_dir, img_size)
+    success = convert_yolo_to_coreml(model_path, output_dir, img_size,
+                                     precision=precision, quantize=quantize,
+                                     use_cache=use_cache)
 
     if success:
         print("\n" + "="*60)
@@ -4,11 +4,73 @@ Create a YOLOv8 face detection model in ONNX format
 """
 import sys
 import os
+import shutil
+import tempfile
+import importlib.util
+import multiprocessing
+
+def download_weights():
+    """
+    Fetch yolov8n.pt and return its absolute path (multiprocessing worker)
+
+    Runs in a pool process so the parent never imports ultralytics/torch
+    before the export workers start. ultralytics may resolve the weights from
+    its own weights directory instead of the working directory.
+    """
+    from ultralytics.utils.downloads import attempt_download_asset
+
+    return os.path.abspath(attempt_download_asset('yolov8n.pt'))
+
+def export_one(weights_path, size):
+    """
+    Export the yolov8n.pt at weights_path to ONNX at one input size (multiprocessing worker)
+
+    Each worker exports from its own copy of the weights in a temp directory,
+    since ultralytics writes the .onnx next to the .pt file.
+    """
+    from ultralytics import YOLO
+
+    work_dir = tempfile.mkdtemp(prefix=f"yolo_{size}_")
+    try:
+        weights = shutil.copy(weights_path, work_dir)
+        onnx_path = YOLO(weights).export(format='onnx', simplify=True, imgsz=size)
+        output = f'yolov5n-face-{size}.onnx'
+        shutil.move(onnx_path, output)
+        print(f"✓ Successfully created {output}")
+        return output
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def create_yolo_face_model(sizes=None):
+    """
+    Create YOLO face detection model
+
+    Args:
+        sizes: Optional list of input sizes. When given, one ONNX model per size
+               (yolov5n-face-<size>.onnx) is exported in parallel processes;
+               otherwise a single yolov5n-face.onnx is exported at the default size.
+    """
+    if importlib.util.find_spec('ultralytics') is None:
+        print("Ultralytics not available, trying alternative download method...")
+        return download_pretrained_model()
+
+    if sizes:
+        # Export each size in its own process so tracing/simplification run
+        # concurrently; spawn gives every worker a fresh interpreter instead of
+        # forking a parent that may hold torch/thread state
+        print("Ultralytics is available, downloading YOLOv8n model...")
+        context = multiprocessing.get_context('spawn')
+        try:
+            with context.Pool(processes=min(len(sizes), os.cpu_count() or 1)) as pool:
+                weights_path = pool.apply(download_weights)
+                print(f"Exporting to ONNX format at sizes: {', '.join(map(str, sizes))}...")
+                pool.starmap(export_one, [(weights_path, size) for size in sizes])
+        except Exception as e:
+            print(f"✗ Failed to export model: {e}")
+            return False
+        return True
 
-def create_yolo_face_model():
-    """Create YOLO face detection model"""
     try:
-        # Try to import ultralytics
         from ultralytics import YOLO
         print("Ultralytics is available, downloading YOLOv8n model...")
 
@@ -35,29 +97,36 @@ def create_yolo_face_model():
 
 def download_pretrained_model():
     """Download a pre-trained YOLO face detection model"""
-    import urllib.request
+    import requests
 
     # Try downloading from alternative sources
     urls = [
         ("https://github.com/akanametov/yolov8-face/releases/download/v0.0.0/yolov8n_face.onnx", "yolov8n_face.onnx"),
         ("https://storage.googleapis.com/yolov8/yolov8n.onnx", "yolov8n.onnx"),
     ]
+    headers = {'User-Agent': 'Mozilla/5.0'}
+    session = requests.Session()
 
     for url, filename in urls:
         try:
             print(f"Trying to download from: {url}")
-            headers = {'User-Agent': 'Mozilla/5.0'}
-            req = urllib.request.Request(url, headers=headers)
-
-            with urllib.request.urlopen(req, timeout=30) as response:
-                data = response.read()
-                if len(data) > 100000:  # At least 100KB
-                    with open('yolov5n-face.onnx', 'wb') as f:
-                        f.write(data)
-                    print(f"✓ Successfully downloaded model ({len(data) / (1024*1024):.2f} MB)")
-                    return True
+
+            with session.get(url, headers=headers, stream=True, timeout=30) as response:
+                response.raise_for_status()
+                # Stream to disk in 64KB blocks instead of buffering the whole model
+                with open('yolov5n-face.onnx', 'wb') as f:
+                    for chunk in response.iter_content(65536):
+                        f.write(chunk)
+
+            size = os.path.getsize('yolov5n-face.onnx')
+            if size > 100000:  # At least 100KB
+                print(f"✓ Successfully downloaded model ({size / (1024*1024):.2f} MB)")
+                return True
+            os.remove('yolov5n-face.onnx')
         except Exception as e:
             print(f"  Failed: {e}")
+            if os.path.exists('yolov5n-face.onnx'):
+                os.remove('yolov5n-face.onnx')
             continue
 
     # If all downloads fail, create a minimal ONNX model stub
@@ -90,8 +159,20 @@ if the YOLO model is not available.
 """)
     print("Created YOLO_MODEL_README.txt with manual download instructions")
 
+def parse_sizes(args):
+    """Parse input sizes from the command line; exits with usage on bad values"""
+    try:
+        sizes = [int(arg) for arg in args]
+    except ValueError as e:
+        sys.exit(f"Invalid size ({e}). Usage: {sys.argv[0]} [SIZE ...], e.g. 320 640")
+    for size in sizes:
+        if size <= 0 or size % 32:
+            sys.exit(f"Invalid size {size}: must be a positive multiple of 32")
+    return sizes
+
 if __name__ == "__main__":
-    if create_yolo_face_model():
+    sizes = parse_sizes(sys.argv[1:])
+    if create_yolo_face_model(sizes or None):
         sys.exit(0)
     else:
         sys.exit(1)
@@ -2,64 +2,206 @@
 """
 Download YOLOv5-face model from GitHub release
 """
-import urllib.request
+import hashlib
+import json
+import shutil
 import sys
+from pathlib import Path
+import requests
 
-def download_file(url, output_path):
-    """Download file from URL with progress"""
+CACHE_DIR = Path.home() / ".cache" / "eyetracking" / "models"
+
+def cache_paths(url):
+    """Return (model_path, sidecar_path) for a URL in the local model cache"""
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    return CACHE_DIR / f"{key}.onnx", CACHE_DIR / f"{key}.json"
+
+def file_sha256(path):
+    """Return the hex SHA256 of a file, read in 64KB blocks"""
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+def copy_from_cache(url, output_path):
+    """Copy a previously downloaded model to output_path if the cached copy is intact"""
+    cached_file, sidecar = cache_paths(url)
+    if not cached_file.exists() or not sidecar.exists():
+        return False
+
+    try:
+        meta = json.loads(sidecar.read_text())
+    except (OSError, ValueError):
+        return False
+
+    # content_length is what the server announced; 0 means it sent none
+    content_length = meta.get('content_length')
+    if content_length and cached_file.stat().st_size != content_length:
+        print(f"Cached model size does not match Content-Length, ignoring: {cached_file}")
+        return False
+    sha256 = meta.get('sha256')
+    if not sha256 or file_sha256(cached_file) != sha256:
+        print(f"Cached model failed SHA256 check, ignoring: {cached_file}")
+        return False
+
+    shutil.copy(cached_file, output_path)
+    print(f"Using cached model: {cached_file} (sha256 {sha256[:16]})")
+    return True
+
+def store_in_cache(url, output_path, content_length):
+    """
+    Record a downloaded model in the local cache with its size and SHA256
+
+    Args:
+        url: Source URL (the cache key)
+        output_path: The downloaded model
+        content_length: Content-Length sent by the server (0 if none)
+    """
+    cached_file, sidecar = cache_paths(url)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+    sha256 = file_sha256(output_path)
+    shutil.copy(output_path, cached_file)
+    sidecar.write_text(json.dumps({
+        'url': url,
+        'content_length': content_length,
+        'sha256': sha256,
+    }))
+
+def looks_like_onnx(path):
+    """
+    Cheap ONNX check: a serialized ModelProto starts with its ir_version
+    field (tag byte 0x08), unlike zip (PK) or pickle (0x80) PyTorch checkpoints
+    """
+    with open(path, 'rb') as f:
+        return f.read(1) == b'\x08'
+
+def download_file(url, output_path, session=None, timeout=30, cancel=None, show_progress=True):
+    """
+    Download file from URL with progress
+
+    Args:
+        url: Source URL
+        output_path: Destination file path
+        session: Optional requests.Session to reuse pooled connections
+        timeout: Connect/read timeout in seconds
+        cancel: Optional threading.Event; the download stops once it is set
+        show_progress: Draw the progress bar (disable when racing downloads)
+
+    Returns:
+        The server's Content-Length (0 if it sent none), or None if the
+        download failed, was cancelled or came up short
+    """
     print(f"Downloading from: {url}")
     print(f"Saving to: {output_path}")
 
+    session = session or requests.Session()
+
     try:
         # Add headers to avoid being blocked
         headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
         }
-        req = urllib.request.Request(url, headers=headers)
 
-        with urllib.request.urlopen(req) as response:
+        with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+            response.raise_for_status()
             total_size = int(response.headers.get('content-length', 0))
             print(f"Total size: {total_size / (1024*1024):.2f} MB")
 
             with open(output_path, 'wb') as f:
                 downloaded = 0
-                block_size = 8192
-                while True:
-                    buffer = response.read(block_size)
-                    if not buffer:
-                        break
+                for buffer in response.iter_content(65536):
+                    if cancel is not None and cancel.is_set():
+                        return None
                     downloaded += len(buffer)
                     f.write(buffer)
-                    if total_size > 0:
+                    if show_progress and total_size > 0:
                         percent = int(50 * downloaded / total_size)
                         sys.stdout.write(f"\r[{'=' * percent}{' ' * (50-percent)}] {downloaded / (1024*1024):.2f} MB")
                         sys.stdout.flush()
-            print("\nDownload complete!")
-            return True
+            if total_size and downloaded != total_size:
+                print(f"\nIncomplete download from {url}: {downloaded} of {total_size} bytes")
+                return None
+            print(f"\nDownload complete: {url}")
+            return total_size
     except Exception as e:
-        print(f"\nError downloading: {e}")
-        return False
+        print(f"\nError downloading {url}: {e}")
+        return None
 
 if __name__ == "__main__":
-    # Try multiple URLs for YOLOv5-face model
+    import os
+    import queue
+    import threading
+
+    # Mirrors of the same ONNX artifact; the race keeps whichever finishes first,
+    # so every entry must serve an interchangeable file
     urls = [
-        "https://github.com/deepcam-cn/yolov5-face/releases/download/v0.0.0/yolov5n-0.5.pt",
         "https://github.com/hpc203/yolov5-face-landmarks-opencv-v2/raw/main/weights/yolov5n-face.onnx",
     ]
 
     output_file = "yolov5n-face.onnx"
+    force_download = "--force-download" in sys.argv[1:]
 
-    for url in urls:
-        print(f"\nTrying URL: {url}")
-        if download_file(url, output_file):
-            import os
-            size = os.path.getsize(output_file)
-            if size > 100000:  # At least 100KB for a valid model
-                print(f"Successfully downloaded model ({size / (1024*1024):.2f} MB)")
+    if not force_download:
+        for url in urls:
+            if copy_from_cache(url, output_file):
                 sys.exit(0)
-            else:
-                print(f"Downloaded file too small ({size} bytes), trying next URL...")
-                os.remove(output_file)
+
+    # Race all URLs and keep the first valid download (hedged requests), so a
+    # slow or dead mirror costs at most one 15 s timeout instead of one per URL
+    cancel = threading.Event()
+    results = queue.Queue()
+    temp_files = {url: f"{output_file}.part{i}" for i, url in enumerate(urls)}
+
+    def remove_part(path):
+        """Delete a .part file; it may already be gone or still open by a loser"""
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def race_download(url):
+        """Download one mirror on its own Session and report (url, result)"""
+        with requests.Session() as session:
+            result = download_file(url, temp_files[url], session=session, timeout=15,
+                                   cancel=cancel, show_progress=False)
+        if cancel.is_set():
+            remove_part(temp_files[url])  # Lost the race
+        results.put((url, result))
+
+    # Daemon threads rather than a ThreadPoolExecutor: executor workers are
+    # joined at interpreter exit even after shutdown(wait=False), so a loser
+    # stalled in a read would still delay exit by up to its timeout
+    for url in urls:
+        threading.Thread(target=race_download, args=(url,), daemon=True).start()
+
+    winner = None
+    content_length = 0
+    for _ in urls:
+        url, result = results.get()
+        if result is None:
+            continue
+        size = os.path.getsize(temp_files[url])
+        if size <= 100000:  # At least 100KB for a valid model
+            print(f"Downloaded file too small ({size} bytes) from {url}")
+        elif not looks_like_onnx(temp_files[url]):
+            print(f"Downloaded file from {url} is not an ONNX model")
+        else:
+            winner = url
+            content_length = result
+            os.replace(temp_files[url], output_file)
+            break
+
+    cancel.set()
+    for path in temp_files.values():
+        remove_part(path)
+
+    if winner is not None:
+        size = os.path.getsize(output_file)
+        print(f"Successfully downloaded model ({size / (1024*1024):.2f} MB) from {winner}")
+        store_in_cache(winner, output_file, content_length)
+        sys.exit(0)
 
     print("\nFailed to download from all sources")
     sys.exit(1)
@@ -14,19 +14,32 @@ CAMERA_INDEX = 0
 CAMERA_WIDTH = 640
 CAMERA_HEIGHT = 480
 CAMERA_FPS = 30
+CAMERA_FOURCC = "MJPG"  # Compressed webcam stream (less USB bandwidth than YUYV); "" keeps the driver default
 
 # Face detection settings
 FACE_DETECTOR_BACKEND = "auto"  # "auto", "haar", "yolo"
 YOLO_MODEL_VARIANT = "n"  # "n" (nano), "s" (small), "m" (medium)
 HAAR_CASCADE_PATH = str(MODELS_DIR / "haarcascade_frontalface_default.xml")
+HAAR_CUDA_CASCADE_PATH = str(MODELS_DIR / "haarcascade_frontalface_default_cuda.xml")  # Old-format cascade (OpenCV data/haarcascades_cuda) for cv2.cuda
+HAAR_DETECT_WIDTH = 320  # Frames are downscaled to this width before the Haar cascade runs
+HAAR_FULL_FRAME_INTERVAL = 10  # Haar searches near the last face; full frame every Nth detection
 YOLO_MODEL_PATH = str(MODELS_DIR / f"yolov5{YOLO_MODEL_VARIANT}-face.pt")
+YOLO_ONNX_PATH = str(MODELS_DIR / f"yolov5{YOLO_MODEL_VARIANT}-face.onnx")  # Used by the "yolo" backend
+YOLO_INPUT_SIZE = 640  # Square network input of the exported ONNX model
+YUNET_MODEL_PATHS = [  # First existing path is used for eye landmarks
+    str(MODELS_DIR / "face_detection_yunet_2023mar.onnx"),
+    str(PROJECT_ROOT.parent / "core" / "models" / "face_detection_yunet_2023mar.onnx"),
+]
 
 # Detection thresholds
 FACE_DETECTION_CONFIDENCE = 0.7
 YOLO_CONF_THRESHOLD = 0.45
 YOLO_NMS_THRESHOLD = 0.35
+USE_OPENCL = True  # Run Haar detection on cv2.UMat (OpenCL) when a device is available
 
 # Tracking settings
+FACE_REDETECT_INTERVAL = 8  # Run the face detector every Nth frame; a KCF tracker follows the face in between
+FACE_DETECT_IN_BACKGROUND = True  # YOLO backend: detect on its own thread, track/reuse the last box in between
 FOCAL_LENGTH = 2000.0  # Camera focal length (pixels)
 AVERAGE_FACE_WIDTH_CM = 15.0  # Average human face width
 
@@ -42,6 +55,7 @@ MOVEMENT_SPEED_DEFAULT = 5  # pixels per frame
 
 # Database settings
 DB_TIMEOUT = 30.0  # seconds
+DB_TRACKING_BATCH_SIZE = 30  # tracking rows per commit (~1 s at 30 FPS)
 
 def ensure_directories():
     """Create necessary directories if they don't exist."""
@@ -3,37 +3,76 @@ SQLite database management for tracking sessions and results.
 """
 import sqlite3
 import json
+import threading
+from time import time
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
 from typing import List, Optional, Dict, Any
 import config
 
+SCHEMA_VERSION = 2
+USER_CACHE_SIZE = 128
+
+# Bit layout of tracking_data.flags
+FLAG_EYES_FOCUSED = 1 << 0
+FLAG_HEAD_MOVING = 1 << 1
+FLAG_SHOULDERS_MOVING = 1 << 2
+FLAG_FACE_DETECTED = 1 << 3
+
 class Database:
     """Manages SQLite database operations for eye tracking data."""
 
     def __init__(self, db_path: Path = config.DATABASE_PATH):
         self.db_path = db_path
-        self.connection: Optional[sqlite3.Connection] = None
+        self._connections: Dict[int, sqlite3.Connection] = {}  # thread ident -> connection
+        self._connections_lock = threading.Lock()
+        self._pending: List[tuple] = []  # Buffered tracking_data rows
+        self._pending_lock = threading.Lock()
+        self._user_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # email -> user row (LRU)
+        self._user_cache_lock = threading.Lock()
 
     def connect(self):
         """Establish database connection and create tables if needed."""
-        self.connection = sqlite3.connect(
-            self.db_path,
-            timeout=config.DB_TIMEOUT,
-            check_same_thread=False
-        )
-        self.connection.row_factory = sqlite3.Row
         self._create_tables()
 
     def disconnect(self):
-        """Close database connection."""
-        if self.connection:
-            self.connection.close()
-            self.connection = None
+        """Flush buffered tracking data and close every thread's connection."""
+        with self._connections_lock:
+            if not self._connections:
+                return
+        self.flush_tracking()
+        with self._connections_lock:
+            connections, self._connections = list(self._connections.values()), {}
+        for connection in connections:
+            connection.close()
+
+    def _conn(self) -> sqlite3.Connection:
+        """
+        Return the calling thread's connection, opening it on first use.
+
+        Each thread gets its own connection so that, with WAL, the tracking
+        thread's writes never block reads on the GUI thread. Connections are
+        only used by their own thread; check_same_thread is off so that
+        disconnect() can close all of them from whichever thread calls it.
+        """
+        ident = threading.get_ident()
+        with self._connections_lock:
+            connection = self._connections.get(ident)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=config.DB_TIMEOUT,
+                                         check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            # WAL + NORMAL sync: commits no longer fsync the main database file
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with self._connections_lock:
+                self._connections[ident] = connection
+        return connection
 
     def _create_tables(self):
         """Create database schema."""
-        cursor = self.connection.cursor()
+        cursor = self._conn().cursor()
 
         # Users table
         cursor.execute("""
@@ -61,25 +100,34 @@ class Database:
             )
         """)
 
-        # Tracking data points table
+        # Tracking data points table (timestamp in unix seconds, booleans packed into flags)
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS tracking_data (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 session_id INTEGER NOT NULL,
-                timestamp TEXT NOT NULL,
+                timestamp REAL NOT NULL,
                 face_distance REAL,
                 gaze_angle_x REAL,
                 gaze_angle_y REAL,
-                eyes_focused INTEGER,
-                head_moving INTEGER,
-                shoulders_moving INTEGER,
-                face_detected INTEGER,
+                flags INTEGER NOT NULL DEFAULT 0,
                 target_x REAL,
                 target_y REAL,
                 FOREIGN KEY (session_id) REFERENCES test_sessions(id)
             )
         """)
 
+        self._migrate_v2(cursor)
+
+        # Indexes for per-session and per-user lookups (also cover the ORDER BY)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_tracking_session_ts
+            ON tracking_data(session_id, timestamp)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_sessions_user
+            ON test_sessions(user_id, started_at DESC)
+        """)
+
         # Calibration data table
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS calibration_data (
@@ -91,30 +139,115 @@ class Database:
             )
         """)
 
-        self.connection.commit()
+        self._conn().commit()
+
+    def _migrate_v2(self, cursor: sqlite3.Cursor):
+        """
+        Convert a v1 tracking_data table (TEXT timestamps, boolean columns) to v2.
+
+        Runs in one explicit transaction: the sqlite3 module would otherwise
+        autocommit each DDL statement, and a crash mid-way would leave an empty
+        v2 table that makes the next start skip the migration.
+        """
+        cursor.execute("PRAGMA user_version")
+        if cursor.fetchone()[0] >= SCHEMA_VERSION:
+            return
+
+        cursor.execute("BEGIN")
+        try:
+            self._migrate_v2_tables(cursor)
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+
+    def _migrate_v2_tables(self, cursor: sqlite3.Cursor):
+        """Rebuild tracking_data in the v2 layout (caller holds the transaction)."""
+        cursor.execute("PRAGMA table_info(tracking_data)")
+        columns = {row["name"] for row in cursor.fetchall()}
+        if "flags" not in columns:
+            cursor.execute("ALTER TABLE tracking_data RENAME TO tracking_data_v1")
+            cursor.execute("DROP INDEX IF EXISTS idx_tracking_session_ts")
+            cursor.execute("""
+                CREATE TABLE tracking_data (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id INTEGER NOT NULL,
+                    timestamp REAL NOT NULL,
+                    face_distance REAL,
+                    gaze_angle_x REAL,
+                    gaze_angle_y REAL,
+                    flags INTEGER NOT NULL DEFAULT 0,
+                    target_x REAL,
+                    target_y REAL,
+                    FOREIGN KEY (session_id) REFERENCES test_sessions(id)
+                )
+            """)
+            cursor.execute(f"""
+                INSERT INTO tracking_data
+                    (id, session_id, timestamp, face_distance, gaze_angle_x, gaze_angle_y,
+                     flags, target_x, target_y)
+                SELECT id, session_id,
+                       (julianday(timestamp, 'utc') - 2440587.5) * 86400.0,
+                       face_distance, gaze_angle_x, gaze_angle_y,
+                       (COALESCE(eyes_focused, 0) != 0) * {FLAG_EYES_FOCUSED}
+                       | (COALESCE(head_moving, 0) != 0) * {FLAG_HEAD_MOVING}
+                       | (COALESCE(shoulders_moving, 0) != 0) * {FLAG_SHOULDERS_MOVING}
+                       | (COALESCE(face_detected, 0) != 0) * {FLAG_FACE_DETECTED},
+                       target_x, target_y
+                FROM tracking_data_v1
+            """)
+            cursor.execute("DROP TABLE tracking_data_v1")
 
     def create_user(self, email: str, role: str = "user") -> int:
         """Create a new user and return user ID."""
-        cursor = self.connection.cursor()
+        with self._user_cache_lock:
+            self._user_cache.pop(email, None)
+        created_at = datetime.now().isoformat()
+        cursor = self._conn().cursor()
         cursor.execute(
             "INSERT INTO users (email, role, created_at) VALUES (?, ?, ?)",
-            (email, role, datetime.now().isoformat())
+            (email, role, created_at)
         )
-        self.connection.commit()
+        self._conn().commit()
+        self._cache_user({
+            "id": cursor.lastrowid,
+            "email": email,
+            "role": role,
+            "created_at": created_at,
+        })
         return cursor.lastrowid
 
     def get_user(self, email: str) -> Optional[Dict[str, Any]]:
-        """Get user by email."""
-        cursor = self.connection.cursor()
+        """Get user by email (served from an LRU cache after the first lookup)."""
+        with self._user_cache_lock:
+            cached = self._user_cache.get(email)
+            if cached is not None:
+                self._user_cache.move_to_end(email)
+                return dict(cached)
+
+        cursor = self._conn().cursor()
         cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
         row = cursor.fetchone()
-        return dict(row) if row else None
+        if row is None:
+            return None
+        user = dict(row)
+        self._cache_user(user)
+        return dict(user)
+
+    def _cache_user(self, user: Dict[str, Any]):
+        """Insert a user row into the LRU cache, evicting the oldest entry if full."""
+        with self._user_cache_lock:
+            self._user_cache[user["email"]] = user
+            self._user_cache.move_to_end(user["email"])
+            if len(self._user_cache) > USER_CACHE_SIZE:
+                self._user_cache.popitem(last=False)
 
     def create_test_session(self, user_id: int, test_type: str,
                            duration: int, circle_size: int = None,
                            movement_speed: int = None) -> int:
         """Create a new test session and return session ID."""
-        cursor = self.connection.cursor()
+        cursor = self._conn().cursor()
         cursor.execute(
             """INSERT INTO test_sessions
                (user_id, test_type, duration, circle_size, movement_speed, started_at)
@@ -122,49 +255,68 @@ class Database:
             (user_id, test_type, duration, circle_size, movement_speed,
              datetime.now().isoformat())
         )
-        self.connection.commit()
+        self._conn().commit()
         return cursor.lastrowid
 
     def complete_test_session(self, session_id: int, results: Dict[str, Any]):
         """Mark test session as completed with results."""
-        cursor = self.connection.cursor()
+        self.flush_tracking()
+        cursor = self._conn().cursor()
         cursor.execute(
             """UPDATE test_sessions
                SET completed_at = ?, results_json = ?
                WHERE id = ?""",
             (datetime.now().isoformat(), json.dumps(results), session_id)
         )
-        self.connection.commit()
+        self._conn().commit()
 
     def add_tracking_data(self, session_id: int, tracking_result: Dict[str, Any],
                          target_x: float = None, target_y: float = None):
-        """Add a tracking data point to a session."""
-        cursor = self.connection.cursor()
-        cursor.execute(
+        """
+        Buffer a tracking data point for a session.
+
+        Rows are written in batches of config.DB_TRACKING_BATCH_SIZE, and any
+        remainder is flushed by complete_test_session() or disconnect().
+        """
+        row = (
+            session_id,
+            time(),  # REAL unix seconds; no datetime allocation or formatting
+            tracking_result.get("face_distance"),
+            tracking_result.get("gaze_angle_x"),
+            tracking_result.get("gaze_angle_y"),
+            (FLAG_EYES_FOCUSED if tracking_result.get("eyes_focused") else 0)
+            | (FLAG_HEAD_MOVING if tracking_result.get("head_moving") else 0)
+            | (FLAG_SHOULDERS_MOVING if tracking_result.get("shoulders_moving") else 0)
+            | (FLAG_FACE_DETECTED if tracking_result.get("face_detected") else 0),
+            target_x,
+            target_y
+        )
+        with self._pending_lock:
+            self._pending.append(row)
+            should_flush = len(self._pending) >= config.DB_TRACKING_BATCH_SIZE
+        if should_flush:
+            self.flush_tracking()
+
+    def flush_tracking(self):
+        """Write all buffered tracking data points in a single transaction."""
+        with self._pending_lock:
+            rows, self._pending = self._pending, []
+        if not rows:
+            return
+        connection = self._conn()
+        cursor = connection.cursor()
+        cursor.executemany(
             """INSERT INTO tracking_data
                (session_id, timestamp, face_distance, gaze_angle_x, gaze_angle_y,
-                eyes_focused, head_moving, shoulders_moving, face_detected,
-                target_x, target_y)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (
-                session_id,
-                datetime.now().isoformat(),
-                tracking_result.get("face_distance"),
-                tracking_result.get("gaze_angle_x"),
-                tracking_result.get("gaze_angle_y"),
-                int(tracking_result.get("eyes_focused", False)),
-                int(tracking_result.get("head_moving", False)),
-                int(tracking_result.get("shoulders_moving", False)),
-                int(tracking_result.get("face_detected", False)),
-                target_x,
-                target_y
-            )
+                flags, target_x, target_y)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            rows
         )
-        self.connection.commit()
+        connection.commit()
 
     def get_user_sessions(self, user_id: int) -> List[Dict[str, Any]]:
         """Get all test sessions for a user."""
-        cursor = self.connection.cursor()
+        cursor = self._conn().cursor()
         cursor.execute(
             "SELECT * FROM test_sessions WHERE user_id = ? ORDER BY started_at DESC",
             (user_id,)
@@ -172,10 +324,25 @@ class Database:
         return [dict(row) for row in cursor.fetchall()]
 
     def get_session_data(self, session_id: int) -> List[Dict[str, Any]]:
-        """Get all tracking data points for a session."""
-        cursor = self.connection.cursor()
+        """
+        Get all tracking data points for a session.
+
+        The packed flags column is expanded back into eyes_focused, head_moving,
+        shoulders_moving and face_detected booleans.
+        """
+        self.flush_tracking()
+        cursor = self._conn().cursor()
         cursor.execute(
             "SELECT * FROM tracking_data WHERE session_id = ? ORDER BY timestamp",
             (session_id,)
         )
-        return [dict(row) for row in cursor.fetchall()]
+        rows = []
+        for row in cursor.fetchall():
+            data = dict(row)
+            flags = data.pop("flags") or 0
+            data["eyes_focused"] = bool(flags & FLAG_EYES_FOCUSED)
+            data["head_moving"] = bool(flags & FLAG_HEAD_MOVING)
+            data["shoulders_moving"] = bool(flags & FLAG_SHOULDERS_MOVING)
+            data["face_detected"] = bool(flags & FLAG_FACE_DETECTED)
+            rows.append(data)
+        return rows
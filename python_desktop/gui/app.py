@@ -2,38 +2,213 @@
 Main PyQt6 GUI application.
 """
 import sys
+import queue
+import threading
+import time
 import cv2
 import numpy as np
-from typing import Optional
+from typing import Optional, Tuple
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QFrame, QGroupBox
 )
 from PyQt6.QtCore import QTimer, Qt, pyqtSignal, QThread
 from PyQt6.QtGui import QImage, QPixmap, QFont
+import config
 from models import User, TrackingResult
 from database import Database
 from tracking import TrackingEngine
 
 
+# Button styles, applied once app-wide in create_app() and matched by object name
+APP_STYLESHEET = """
+    #startButton, #stopButton, #calibrateButton {
+        color: white;
+        font-size: 14pt;
+        border-radius: 5px;
+        padding: 5px 15px;
+    }
+    #startButton { background-color: #4CAF50; }
+    #startButton:hover { background-color: #45a049; }
+    #stopButton { background-color: #f44336; }
+    #stopButton:hover { background-color: #da190b; }
+    #startButton:disabled, #stopButton:disabled { background-color: #cccccc; }
+    #calibrateButton { background-color: #2196F3; }
+    #calibrateButton:hover { background-color: #0b7dda; }
+"""
+
+
 class TrackingThread(QThread):
-    """Background thread for camera tracking."""
+    """
+    Background thread for camera tracking.
+
+    Publishes the most recent (QImage, result) pair into a single slot and
+    emits the parameterless frame_ready signal; the GUI then takes the slot.
+    Each QImage aliases one of the thread's preallocated RGB buffers.
+    No pixel data crosses the queued connection, slow inference never blocks
+    the UI, and stale frames are overwritten rather than queued.
+    """
 
-    frame_ready = pyqtSignal(np.ndarray, TrackingResult)
+    frame_ready = pyqtSignal()
 
-    def __init__(self, tracking_engine: TrackingEngine):
+    # Frames buffered between the capture thread and tracking (back-pressure)
+    CAPTURE_QUEUE_SIZE = 2
+
+    def __init__(self, tracking_engine: TrackingEngine,
+                 display_size: Tuple[int, int] = (config.CAMERA_WIDTH, config.CAMERA_HEIGHT),
+                 min_frame_interval: float = 0.0):
         super().__init__()
         self.tracking_engine = tracking_engine
+        self.display_size = display_size  # (width, height) frames are fitted to
+        self.min_frame_interval = min_frame_interval  # seconds; display refresh period
         self.running = False
+        self._latest: Optional[Tuple[QImage, TrackingResult]] = None
+        self._lock = threading.Lock()
+
+        # Ring of capture buffers the camera decodes into, so reads don't
+        # allocate a new frame each time. Sized for the queued frames plus the
+        # one being tracked and the one being decoded
+        self._capture_buffers = [
+            np.empty((config.CAMERA_HEIGHT, config.CAMERA_WIDTH, 3), dtype=np.uint8)
+            for _ in range(self.CAPTURE_QUEUE_SIZE + 2)
+        ]
+        self._capture_index = 0
+
+        # Rotating RGB output buffers: the GUI may still be reading the previous
+        # frame while the next one is converted, so a single buffer could tear
+        self._rgb_buffers = [
+            np.empty((config.CAMERA_HEIGHT, config.CAMERA_WIDTH, 3), dtype=np.uint8)
+            for _ in range(3)
+        ]
+        # QImage header aliasing each RGB buffer, built once per buffer
+        self._qimages = [self._wrap_rgb(buffer) for buffer in self._rgb_buffers]
+        self._rgb_index = 0
+        self._resize_buf: Optional[np.ndarray] = None  # BGR frame fitted to display_size
+
+        # Last published state, used to skip frames where nothing changed
+        self._last_result: Optional[TrackingResult] = None
+        self._last_sample: Optional[np.ndarray] = None
 
     def run(self):
-        """Main tracking loop."""
+        """
+        Main tracking loop.
+
+        Camera reads run on a separate capture thread feeding a bounded queue,
+        so decoding the next frame overlaps tracking of the current one.
+        """
         self.running = True
+        frames: queue.Queue = queue.Queue(maxsize=self.CAPTURE_QUEUE_SIZE)
+        capture_thread = threading.Thread(target=self._capture_loop, args=(frames,), daemon=True)
+        capture_thread.start()
+
+        # Bound once: these are looked up every frame otherwise
+        next_frame = frames.get
+        process_frame = self.tracking_engine.process_frame
+        emit_frame_ready = self.frame_ready.emit
+        fit_sizes = {}  # (width, height) -> fitted size
+        last_publish = 0.0
+        publish_ema = 0.0  # Smoothed cost of converting and publishing a frame
+
         while self.running:
-            result, display_frame = self.tracking_engine.process_frame()
-            if display_frame is not None:
-                self.frame_ready.emit(display_frame, result)
-            self.msleep(33)  # ~30 FPS
+            try:
+                frame = next_frame(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            result, display_frame = process_frame(frame)
+            if display_frame is None:
+                continue
+
+            # Don't publish faster than the display can show frames; tracking
+            # itself still runs on every frame
+            now = time.monotonic()
+            if now - last_publish < self.min_frame_interval - publish_ema:
+                continue
+
+            # Skip conversion and publishing when neither the tracking result
+            # nor a coarse pixel sample changed (e.g. a static or frozen feed)
+            sample = display_frame[::16, ::16]
+            if (result == self._last_result and self._last_sample is not None
+                    and np.array_equal(sample, self._last_sample)):
+                continue
+            self._last_result = result
+            self._last_sample = sample.copy()
+
+            # Fit to the display size here, in the same pass as the color
+            # conversion, so the GUI thread never rescales
+            height, width = display_frame.shape[:2]
+            fit_size = fit_sizes.get((width, height))
+            if fit_size is None:
+                fit_size = fit_sizes[(width, height)] = self._fit_size(width, height)
+            if fit_size != (width, height):
+                if self._resize_buf is None or self._resize_buf.shape[1::-1] != fit_size:
+                    self._resize_buf = np.empty((fit_size[1], fit_size[0], 3), dtype=np.uint8)
+                display_frame = cv2.resize(display_frame, fit_size, dst=self._resize_buf,
+                                           interpolation=cv2.INTER_LINEAR)
+
+            # Convert to RGB here so the GUI thread only wraps the buffer
+            rgb_frame, q_image = self._next_rgb_buffer(display_frame.shape)
+            cv2.cvtColor(display_frame, cv2.COLOR_BGR2RGB, dst=rgb_frame)
+            with self._lock:
+                self._latest = (q_image, result)
+            emit_frame_ready()
+
+            last_publish = time.monotonic()
+            publish_ema = 0.9 * publish_ema + 0.1 * (last_publish - now)
+
+        capture_thread.join()
+
+    def _capture_loop(self, frames: queue.Queue):
+        """Capture thread: read frames and queue them, blocking while the queue is full."""
+        while self.running:
+            success, frame = self._read_frame()
+            if not success:
+                time.sleep(0.005)  # No frame available; avoid spinning
+                continue
+            while self.running:
+                try:
+                    frames.put(frame, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+
+    def _read_frame(self) -> Tuple[bool, Optional[np.ndarray]]:
+        """Read the next camera frame into the capture ring buffer."""
+        self._capture_index = (self._capture_index + 1) % len(self._capture_buffers)
+        buffer = self._capture_buffers[self._capture_index]
+        success, frame = self.tracking_engine.camera.read_frame(out=buffer)
+        if success and frame is not buffer:
+            # Camera delivered a different shape; keep the new array for reuse
+            self._capture_buffers[self._capture_index] = frame
+        return success, frame
+
+    def _fit_size(self, width: int, height: int) -> Tuple[int, int]:
+        """Largest size within display_size that keeps the frame's aspect ratio."""
+        max_width, max_height = self.display_size
+        scale = min(max_width / width, max_height / height)
+        return (max(1, round(width * scale)), max(1, round(height * scale)))
+
+    def _next_rgb_buffer(self, shape: Tuple[int, ...]) -> Tuple[np.ndarray, QImage]:
+        """Return the next preallocated RGB buffer and its QImage, resizing if the shape differs."""
+        self._rgb_index = (self._rgb_index + 1) % len(self._rgb_buffers)
+        buffer = self._rgb_buffers[self._rgb_index]
+        if buffer.shape != shape:
+            buffer = np.empty(shape, dtype=np.uint8)
+            self._rgb_buffers[self._rgb_index] = buffer
+            self._qimages[self._rgb_index] = self._wrap_rgb(buffer)
+        return buffer, self._qimages[self._rgb_index]
+
+    @staticmethod
+    def _wrap_rgb(buffer: np.ndarray) -> QImage:
+        """Wrap an RGB buffer in a QImage without copying (the buffer must outlive it)."""
+        height, width = buffer.shape[:2]
+        return QImage(buffer.data, width, height, 3 * width, QImage.Format.Format_RGB888)
+
+    def take_latest(self) -> Optional[Tuple[QImage, TrackingResult]]:
+        """Return the newest (frame, result) pair, or None if nothing new arrived."""
+        with self._lock:
+            latest, self._latest = self._latest, None
+        return latest
 
     def stop(self):
         """Stop the tracking thread."""
@@ -49,6 +224,8 @@ class EyeTrackingApp(QMainWindow):
         self.tracking_engine = TrackingEngine()
         self.current_user: Optional[User] = None
         self.tracking_thread: Optional[TrackingThread] = None
+        self._eyes_focused_shown: Optional[bool] = None  # State last styled on the label
+        self._label_texts = {}  # QLabel -> last text set, to skip redundant setText()
 
         # Create demo user
         self._create_demo_user()
@@ -127,6 +304,7 @@ class EyeTrackingApp(QMainWindow):
 
         self.video_label = QLabel()
         self.video_label.setFixedSize(640, 480)
+        self._video_size = self.video_label.size()  # Fixed, so cached for the frame path
         self.video_label.setStyleSheet("background-color: black;")
         self.video_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         video_layout.addWidget(self.video_label)
@@ -162,58 +340,19 @@ class EyeTrackingApp(QMainWindow):
         button_layout.setSpacing(10)
 
         self.start_button = QPushButton("Start Tracking")
+        self.start_button.setObjectName("startButton")  # Styled by APP_STYLESHEET
         self.start_button.setFixedHeight(40)
-        self.start_button.setStyleSheet("""
-            QPushButton {
-                background-color: #4CAF50;
-                color: white;
-                font-size: 14pt;
-                border-radius: 5px;
-                padding: 5px 15px;
-            }
-            QPushButton:hover {
-                background-color: #45a049;
-            }
-            QPushButton:disabled {
-                background-color: #cccccc;
-            }
-        """)
         self.start_button.clicked.connect(self._on_start_tracking)
 
         self.stop_button = QPushButton("Stop Tracking")
+        self.stop_button.setObjectName("stopButton")
         self.stop_button.setFixedHeight(40)
         self.stop_button.setEnabled(False)
-        self.stop_button.setStyleSheet("""
-            QPushButton {
-                background-color: #f44336;
-                color: white;
-                font-size: 14pt;
-                border-radius: 5px;
-                padding: 5px 15px;
-            }
-            QPushButton:hover {
-                background-color: #da190b;
-            }
-            QPushButton:disabled {
-                background-color: #cccccc;
-            }
-        """)
         self.stop_button.clicked.connect(self._on_stop_tracking)
 
         self.calibrate_button = QPushButton("Calibrate")
+        self.calibrate_button.setObjectName("calibrateButton")
         self.calibrate_button.setFixedHeight(40)
-        self.calibrate_button.setStyleSheet("""
-            QPushButton {
-                background-color: #2196F3;
-                color: white;
-                font-size: 14pt;
-                border-radius: 5px;
-                padding: 5px 15px;
-            }
-            QPushButton:hover {
-                background-color: #0b7dda;
-            }
-        """)
         self.calibrate_button.clicked.connect(self._on_calibrate)
 
         button_layout.addWidget(self.start_button)
@@ -233,8 +372,13 @@ class EyeTrackingApp(QMainWindow):
         self.tracking_engine.start_tracking()
 
         # Start tracking thread
-        self.tracking_thread = TrackingThread(self.tracking_engine)
-        self.tracking_thread.frame_ready.connect(self._update_frame)
+        refresh_rate = self.screen().refreshRate() if self.screen() else 0.0
+        self.tracking_thread = TrackingThread(
+            self.tracking_engine,
+            (self._video_size.width(), self._video_size.height()),
+            1.0 / refresh_rate if refresh_rate > 0 else 0.0
+        )
+        self.tracking_thread.frame_ready.connect(self._on_frame_ready)
         self.tracking_thread.start()
 
     def _on_stop_tracking(self):
@@ -260,43 +404,49 @@ class EyeTrackingApp(QMainWindow):
         """Handle calibrate button."""
         self.status_label.setText("Calibration not yet implemented")
 
-    def _update_frame(self, frame: np.ndarray, result: TrackingResult):
+    def _on_frame_ready(self):
+        """Render the newest tracked frame, if not already taken by an earlier signal."""
+        if self.tracking_thread is None:
+            return
+        latest = self.tracking_thread.take_latest()
+        if latest is not None:
+            self._update_frame(*latest)
+
+    def _update_frame(self, q_image: QImage, result: TrackingResult):
         """Update video frame and tracking info."""
-        # Convert frame to QPixmap
-        height, width, channel = frame.shape
-        bytes_per_line = 3 * width
-        q_image = QImage(frame.data, width, height, bytes_per_line, QImage.Format.Format_RGB888)
-        q_image = q_image.rgbSwapped()  # BGR to RGB
-        pixmap = QPixmap.fromImage(q_image)
-
-        # Scale to fit label
-        scaled_pixmap = pixmap.scaled(
-            self.video_label.size(),
-            Qt.AspectRatioMode.KeepAspectRatio,
-            Qt.TransformationMode.SmoothTransformation
-        )
-        self.video_label.setPixmap(scaled_pixmap)
+        # Already fitted to the label by TrackingThread; no scaling pass here
+        self.video_label.setPixmap(QPixmap.fromImage(q_image))
 
         # Update tracking info
-        self.face_detected_label.setText(
+        self._set_label_text(
+            self.face_detected_label,
             f"Face Detected: {'Yes' if result.face_detected else 'No'}"
         )
-        self.distance_label.setText(f"Distance: {result.face_distance:.1f} cm")
-        self.gaze_x_label.setText(f"Gaze X: {result.gaze_angle_x:.1f}°")
-        self.gaze_y_label.setText(f"Gaze Y: {result.gaze_angle_y:.1f}°")
-
-        # Eyes focused with color
-        if result.eyes_focused:
-            self.eyes_focused_label.setText("Eyes Focused: Yes")
-            self.eyes_focused_label.setStyleSheet("padding: 5px; font-size: 12pt; color: green; font-weight: bold;")
-        else:
-            self.eyes_focused_label.setText("Eyes Focused: No")
-            self.eyes_focused_label.setStyleSheet("padding: 5px; font-size: 12pt; color: red;")
-
-        self.head_moving_label.setText(
+        self._set_label_text(self.distance_label, f"Distance: {result.face_distance:.1f} cm")
+        self._set_label_text(self.gaze_x_label, f"Gaze X: {result.gaze_angle_x:.1f}°")
+        self._set_label_text(self.gaze_y_label, f"Gaze Y: {result.gaze_angle_y:.1f}°")
+
+        # Eyes focused with color (restyle only on change; setStyleSheet re-parses QSS)
+        if result.eyes_focused != self._eyes_focused_shown:
+            self._eyes_focused_shown = result.eyes_focused
+            if result.eyes_focused:
+                self.eyes_focused_label.setText("Eyes Focused: Yes")
+                self.eyes_focused_label.setStyleSheet("padding: 5px; font-size: 12pt; color: green; font-weight: bold;")
+            else:
+                self.eyes_focused_label.setText("Eyes Focused: No")
+                self.eyes_focused_label.setStyleSheet("padding: 5px; font-size: 12pt; color: red;")
+
+        self._set_label_text(
+            self.head_moving_label,
             f"Head Moving: {'Yes' if result.head_moving else 'No'}"
         )
 
+    def _set_label_text(self, label: QLabel, text: str):
+        """Set label text only if it changed, avoiding a relayout and repaint."""
+        if self._label_texts.get(label) != text:
+            self._label_texts[label] = text
+            label.setText(text)
+
     def closeEvent(self, event):
         """Handle window close event."""
         # Stop tracking if running
@@ -314,6 +464,7 @@ def create_app(database: Database) -> QApplication:
     """Create and configure the PyQt6 application."""
     app = QApplication(sys.argv)
     app.setStyle("Fusion")  # Modern look
+    app.setStyleSheet(APP_STYLESHEET)
 
     window = EyeTrackingApp(database)
 
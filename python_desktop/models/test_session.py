@@ -1,10 +1,40 @@
 """
 TestSession data model - matches Flutter app's TestSession.
 """
-from dataclasses import dataclass, field
+import time
+from dataclasses import InitVar, dataclass
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Union
 from enum import Enum
+import numpy as np
+from .tracking_result import TrackingResult, TRACKING_DTYPE
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; calculate_results then uses plain NumPy
+    njit = None
+
+INITIAL_CAPACITY = 1024  # tracking points (~34 s at 30 FPS) before the buffer grows
+
+def _aggregate_error_numpy(gaze_x, gaze_y, target_x, target_y, valid, n) -> Tuple[float, int]:
+    """Sum |gaze - target| (x + y) over the first n valid points; returns (total, count)."""
+    valid = valid[:n]
+    error = np.abs(gaze_x[:n] - target_x[:n]) + np.abs(gaze_y[:n] - target_y[:n])
+    return float(error[valid].sum()), int(np.count_nonzero(valid))
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _aggregate_error(gaze_x, gaze_y, target_x, target_y, valid, n) -> Tuple[float, int]:
+        """Sum |gaze - target| (x + y) over the first n valid points; returns (total, count)."""
+        total = 0.0
+        count = 0
+        for i in range(n):
+            if valid[i]:
+                total += abs(gaze_x[i] - target_x[i]) + abs(gaze_y[i] - target_y[i])
+                count += 1
+        return total, count
+else:
+    _aggregate_error = _aggregate_error_numpy
 
 class TestType(Enum):
     """Test movement types."""
@@ -12,7 +42,7 @@ class TestType(Enum):
     HORIZONTAL = "horizontal"
     VERTICAL = "vertical"
 
-@dataclass
+@dataclass(slots=True)
 class TestConfiguration:
     """Configuration for a test session."""
     duration: int  # seconds
@@ -54,24 +84,91 @@ class TestSession:
     started_at: datetime
     completed_at: Optional[datetime] = None
     results: Optional[TestResults] = None
-    tracking_data: List[Dict[str, Any]] = field(default_factory=list)
+    # Points in the tracking_data export format, loaded into the buffer on construction
+    initial_points: InitVar[Optional[List[Dict[str, Any]]]] = None
+
+    def __post_init__(self, initial_points: Optional[List[Dict[str, Any]]]):
+        # Buffer state is kept out of the dataclass fields (and so out of
+        # __eq__, __repr__ and asdict()). Tracking points live in a preallocated
+        # TRACKING_DTYPE record array; only the first _n rows are valid. This
+        # avoids a dict per frame and lets calculate_results() scan contiguous
+        # columns.
+        self._buf = np.empty(INITIAL_CAPACITY, TRACKING_DTYPE)
+        self._n = 0
+        # Points store monotonic ns offsets; wall-clock times are derived only on export
+        self._t0_ns = time.monotonic_ns()
+        self._t0_wall = time.time()
+        for point in initial_points or ():
+            timestamp = point.get("timestamp")
+            if timestamp is None:
+                elapsed_ns = time.monotonic_ns() - self._t0_ns
+            else:
+                wall = datetime.fromisoformat(timestamp).timestamp()
+                elapsed_ns = round((wall - self._t0_wall) * 1e9)
+            target = point["target"]
+            self._append(point["tracking"], target["x"], target["y"], elapsed_ns)
 
     def is_complete(self) -> bool:
         """Check if session is completed."""
         return self.completed_at is not None
 
-    def add_tracking_point(self, tracking_result: Dict[str, Any],
+    @property
+    def tracking_data(self) -> List[Dict[str, Any]]:
+        """Tracking points as a list of dicts (built on demand, for export)."""
+        points = []
+        for row in self._buf[:self._n].tolist():
+            (elapsed_ns, face_distance, gaze_x, gaze_y, target_x, target_y,
+             face_detected, eyes_focused, head_moving, shoulders_moving) = row
+            points.append({
+                "timestamp": datetime.fromtimestamp(self._t0_wall + elapsed_ns / 1e9).isoformat(),
+                "tracking": {
+                    "face_distance": face_distance,
+                    "gaze_angle_x": gaze_x,
+                    "gaze_angle_y": gaze_y,
+                    "eyes_focused": eyes_focused,
+                    "head_moving": head_moving,
+                    "shoulders_moving": shoulders_moving,
+                    "face_detected": face_detected,
+                },
+                "target": {"x": target_x, "y": target_y},
+            })
+        return points
+
+    def add_tracking_point(self, tracking_result: Union[TrackingResult, Dict[str, Any]],
                           target_x: float, target_y: float):
         """Add a tracking data point with target position."""
-        self.tracking_data.append({
-            "timestamp": datetime.now().isoformat(),
-            "tracking": tracking_result,
-            "target": {"x": target_x, "y": target_y},
-        })
+        self._append(tracking_result, target_x, target_y, time.monotonic_ns() - self._t0_ns)
+
+    def _append(self, tracking_result: Union[TrackingResult, Dict[str, Any]],
+                target_x: float, target_y: float, elapsed_ns: int):
+        """Write one tracking point into the buffer, growing it if full."""
+        if self._n == len(self._buf):
+            self._grow()
+
+        if isinstance(tracking_result, TrackingResult):
+            r = tracking_result
+            row = (elapsed_ns, r.face_distance, r.gaze_angle_x, r.gaze_angle_y,
+                   target_x, target_y, r.face_detected, r.eyes_focused,
+                   r.head_moving, r.shoulders_moving)
+        else:
+            get = tracking_result.get
+            row = (elapsed_ns, get("face_distance", 0.0), get("gaze_angle_x", 0.0),
+                   get("gaze_angle_y", 0.0), target_x, target_y,
+                   bool(get("face_detected")), bool(get("eyes_focused")),
+                   bool(get("head_moving")), bool(get("shoulders_moving")))
+
+        self._buf[self._n] = row
+        self._n += 1
+
+    def _grow(self):
+        """Double the capacity of the tracking buffer."""
+        new = np.empty(len(self._buf) * 2, dtype=TRACKING_DTYPE)
+        new[:self._n] = self._buf[:self._n]
+        self._buf = new
 
     def calculate_results(self) -> TestResults:
         """Calculate test results from tracking data."""
-        if not self.tracking_data:
+        if self._n == 0:
             return TestResults(
                 accuracy=0.0,
                 reaction_time=0.0,
@@ -80,29 +177,19 @@ class TestSession:
             )
 
         # Simple accuracy calculation based on gaze vs target distance
-        total_error = 0.0
-        valid_points = 0
-
-        for point in self.tracking_data:
-            tracking = point["tracking"]
-            target = point["target"]
-
-            if tracking.get("face_detected") and tracking.get("eyes_focused"):
-                # Calculate distance between gaze and target
-                # For now, simplified calculation
-                gaze_x = tracking.get("gaze_angle_x", 0.0)
-                gaze_y = tracking.get("gaze_angle_y", 0.0)
-
-                # Normalize angles to screen coordinates (simplified)
-                # This would need proper calibration in real implementation
-                error = abs(gaze_x - target["x"]) + abs(gaze_y - target["y"])
-                total_error += error
-                valid_points += 1
+        # (angles compared to screen coordinates directly; this would need
+        # proper calibration in a real implementation)
+        data = self._buf[:self._n]
+        valid = data["face_detected"] & data["eyes_focused"]
+        total_error, valid_points = _aggregate_error(
+            data["gaze_x"], data["gaze_y"], data["target_x"], data["target_y"],
+            valid, self._n
+        )
 
         if valid_points == 0:
             accuracy = 0.0
         else:
-            avg_error = total_error / valid_points
+            avg_error = float(total_error) / valid_points
             # Convert error to accuracy (0-1 scale, lower error = higher accuracy)
             accuracy = max(0.0, 1.0 - (avg_error / 1000.0))
 
@@ -141,5 +228,5 @@ class TestSession:
             "started_at": self.started_at.isoformat(),
             "completed_at": self.completed_at.isoformat() if self.completed_at else None,
             "results": self.results.to_dict() if self.results else None,
-            "tracking_data_count": len(self.tracking_data),
+            "tracking_data_count": self._n,
         }
@@ -3,8 +3,34 @@ TrackingResult data model - matches Flutter app's TrackingResult.
 """
 from dataclasses import dataclass
 from typing import Optional
+import numpy as np
 
-@dataclass
+# Per-point record stored by TestSession (one row per tracking sample)
+TRACKING_DTYPE = np.dtype([
+    ("elapsed_ns", "i8"),  # monotonic nanoseconds since the session started
+    ("face_distance", "f8"),
+    ("gaze_x", "f8"),
+    ("gaze_y", "f8"),
+    ("target_x", "f8"),
+    ("target_y", "f8"),
+    ("face_detected", "?"),
+    ("eyes_focused", "?"),
+    ("head_moving", "?"),
+    ("shoulders_moving", "?"),
+])
+
+# Per-frame record returned by TrackingEngine.process_frames (one row per frame)
+FRAME_RESULT_DTYPE = np.dtype([
+    ("face_detected", "?"),
+    ("face_rect", "i4", (4,)),  # x, y, width, height
+    ("face_distance", "f4"),
+    ("gaze_x", "f4"),
+    ("gaze_y", "f4"),
+    ("eyes_focused", "?"),
+    ("head_moving", "?"),
+])
+
+@dataclass(slots=True)
 class TrackingResult:
     """Real-time tracking data from computer vision engine."""
 
@@ -3,6 +3,7 @@ Camera capture and frame management.
 """
 import cv2
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Tuple
 import config
 
@@ -25,10 +26,14 @@ class CameraCapture:
             print(f"Failed to open camera {self.camera_index}")
             return False
 
-        # Set camera properties
+        # Set camera properties (pixel format first; some drivers reset it on resize)
+        if config.CAMERA_FOURCC:
+            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*config.CAMERA_FOURCC))
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, config.CAMERA_WIDTH)
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, config.CAMERA_HEIGHT)
         self.cap.set(cv2.CAP_PROP_FPS, config.CAMERA_FPS)
+        # Keep only the newest frame queued so each read returns a fresh frame
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
 
         self.is_running = True
         print(f"Camera {self.camera_index} started: {config.CAMERA_WIDTH}x{config.CAMERA_HEIGHT} @ {config.CAMERA_FPS} FPS")
@@ -42,28 +47,41 @@ class CameraCapture:
         self.is_running = False
         print("Camera stopped")
 
-    def read_frame(self) -> Tuple[bool, Optional[np.ndarray]]:
+    def read_frame(self, out: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
         """
         Read a frame from the camera.
 
+        Args:
+            out: Optional preallocated BGR array to decode into. If its shape
+                does not match the camera, OpenCV returns a new array instead.
+
         Returns:
             Tuple of (success: bool, frame: Optional[np.ndarray])
         """
         if not self.is_running or not self.cap:
             return False, None
 
-        ret, frame = self.cap.read()
+        if out is None:
+            ret, frame = self.cap.read()
+        elif self.cap.grab():
+            ret, frame = self.cap.retrieve(out)
+        else:
+            ret, frame = False, None
         return ret, frame if ret else None
 
     def get_available_cameras(self) -> list:
         """Get list of available camera indices."""
-        available = []
-        for i in range(10):  # Check first 10 indices
-            cap = cv2.VideoCapture(i)
-            if cap.isOpened():
-                available.append(i)
-                cap.release()
-        return available
+        def probe(index: int) -> Optional[int]:
+            cap = cv2.VideoCapture(index)
+            opened = cap.isOpened()
+            cap.release()
+            return index if opened else None
+
+        # Probes mostly wait on device I/O (OpenCV releases the GIL), so run
+        # them concurrently rather than paying each timeout in turn
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            results = executor.map(probe, range(10))  # Check first 10 indices
+        return [index for index in results if index is not None]
 
     def switch_camera(self, camera_index: int) -> bool:
         """Switch to a different camera."""
@@ -3,17 +3,56 @@ Eye tracking and gaze estimation (simplified implementation).
 """
 import cv2
 import numpy as np
+from pathlib import Path
 from typing import Optional, Tuple
+import config
 
 class EyeTracker:
     """Eye detection and gaze estimation."""
 
+    # Detect on a downscaled face ROI (rectangles are scaled back up)
+    DETECT_SCALE = 0.5
+
     def __init__(self):
-        self.eye_cascade = None
-        self._initialize_eye_detector()
+        self.eye_cascade = None  # Loaded on the first detect_eyes() call
+        self._eye_cascade_loaded = False
+        # Reused eye-band buffers for pupil detection (reallocated when the face size changes)
+        self._band_gray: Optional[np.ndarray] = None
+        self._band_blur: Optional[np.ndarray] = None
+        self.landmark_detector = None  # YuNet (cv2.FaceDetectorYN), preferred when available
+        self._initialize_landmark_detector()
+
+    def _initialize_landmark_detector(self):
+        """Initialize YuNet face landmark detector (eye centers without a cascade pass)."""
+        model_path = next((p for p in config.YUNET_MODEL_PATHS if Path(p).exists()), None)
+        if model_path is None or not hasattr(cv2, "FaceDetectorYN"):
+            print("YuNet model not found, using pupil (darkest point) search for gaze")
+            return
+
+        # Prefer CUDA, then OpenCL FP16 (iGPU), then plain CPU
+        backend_id, target_id = cv2.dnn.DNN_BACKEND_OPENCV, cv2.dnn.DNN_TARGET_CPU
+        try:
+            if cv2.cuda.getCudaEnabledDeviceCount() > 0:
+                backend_id, target_id = cv2.dnn.DNN_BACKEND_CUDA, cv2.dnn.DNN_TARGET_CUDA_FP16
+            elif cv2.ocl.haveOpenCL():
+                target_id = cv2.dnn.DNN_TARGET_OPENCL_FP16
+        except (AttributeError, cv2.error):
+            pass
+
+        try:
+            self.landmark_detector = cv2.FaceDetectorYN.create(
+                model_path, "", (320, 240),
+                score_threshold=0.6, nms_threshold=0.3, top_k=5,
+                backend_id=backend_id, target_id=target_id
+            )
+            print(f"YuNet landmark detector loaded from {model_path}")
+        except cv2.error as e:
+            print(f"Warning: Failed to load YuNet: {e}")
+            self.landmark_detector = None
 
     def _initialize_eye_detector(self):
-        """Initialize eye cascade detector."""
+        """Initialize eye cascade detector (gaze no longer needs it, so only detect_eyes loads it)."""
+        self._eye_cascade_loaded = True
         try:
             cascade_path = cv2.data.haarcascades + "haarcascade_eye.xml"
             self.eye_cascade = cv2.CascadeClassifier(cascade_path)
@@ -34,8 +73,10 @@ class EyeTracker:
             face_roi: Face region (grayscale or BGR)
 
         Returns:
-            List of eye rectangles [(x, y, w, h), ...]
+            List of eye rectangles [(x, y, w, h), ...] in face_roi coordinates
         """
+        if not self._eye_cascade_loaded:
+            self._initialize_eye_detector()
         if self.eye_cascade is None or face_roi is None or face_roi.size == 0:
             return []
 
@@ -45,15 +86,20 @@ class EyeTracker:
         else:
             gray = face_roi
 
-        # Detect eyes
+        # Detect eyes at reduced resolution (cascade cost scales with pixel count)
+        small = cv2.resize(gray, None, fx=self.DETECT_SCALE, fy=self.DETECT_SCALE,
+                           interpolation=cv2.INTER_AREA)
+        min_size = int(20 * self.DETECT_SCALE)
         eyes = self.eye_cascade.detectMultiScale(
-            gray,
+            small,
             scaleFactor=1.1,
             minNeighbors=5,
-            minSize=(20, 20)
+            minSize=(min_size, min_size)
         )
 
-        return eyes.tolist() if len(eyes) > 0 else []
+        if len(eyes) == 0:
+            return []
+        return (eyes / self.DETECT_SCALE).astype(int).tolist()
 
     def estimate_gaze(self, frame: np.ndarray, face_rect: Tuple[int, int, int, int]) -> Tuple[float, float]:
         """
@@ -68,41 +114,82 @@ class EyeTracker:
         """
         x, y, w, h = face_rect
 
-        # Extract face ROI
-        face_roi = frame[y:y+h, x:x+w]
+        # Eye centers from YuNet landmarks when available, else the darkest
+        # point (pupil) in each half of the eye band
+        centers = None
+        if self.landmark_detector is not None:
+            centers = self._detect_eye_centers_landmarks(frame, face_rect)
 
-        # Detect eyes in face
-        eyes = self.detect_eyes(face_roi)
+        if centers is None:
+            centers = self._detect_pupil_centers(frame[y:y+h, x:x+w])
 
-        if len(eyes) >= 2:
+        if centers is not None:
             # Found both eyes - calculate gaze based on eye positions
             # This is a simplified calculation - real gaze estimation is much more complex
+            # (average eye position relative to face center, scaled to -30..+30 degrees)
+            face_center = np.array([w // 2, h // 2])
+            avg_eye = np.asarray(centers).sum(axis=0) // 2
+            gaze_x, gaze_y = (avg_eye - face_center) * (30.0 / face_center)
 
-            # Sort eyes by x position (left to right)
-            eyes = sorted(eyes, key=lambda e: e[0])
-            left_eye = eyes[0]
-            right_eye = eyes[1]
-
-            # Calculate eye centers in face ROI coordinates
-            left_center = (left_eye[0] + left_eye[2] // 2, left_eye[1] + left_eye[3] // 2)
-            right_center = (right_eye[0] + right_eye[2] // 2, right_eye[1] + right_eye[3] // 2)
+            return (float(gaze_x), float(gaze_y))
 
-            # Calculate gaze direction (simplified - just eye position relative to face center)
-            face_center_x = w // 2
-            face_center_y = h // 2
-
-            # Average eye position
-            avg_eye_x = (left_center[0] + right_center[0]) // 2
-            avg_eye_y = (left_center[1] + right_center[1]) // 2
+        # No eyes detected or insufficient data - return neutral gaze
+        return (0.0, 0.0)
 
-            # Calculate angles (normalized to -30 to +30 degrees)
-            gaze_x = ((avg_eye_x - face_center_x) / face_center_x) * 30.0
-            gaze_y = ((avg_eye_y - face_center_y) / face_center_y) * 30.0
+    def _detect_pupil_centers(self, face_roi: np.ndarray):
+        """
+        Locate both pupils as the darkest points of the eye band.
 
-            return (gaze_x, gaze_y)
+        A single blur + cv2.minMaxLoc per eye instead of a cascade pass; coarse,
+        but enough for the +/-30 degree gaze estimate. Returns
+        ((left_x, left_y), (right_x, right_y)) in face_roi coordinates, or None.
+        """
+        h, w = face_roi.shape[:2]
+        top, bottom = h // 5, h // 2  # Eyes sit in this band of a Haar face box
+        if w < 4 or bottom - top < 3:
+            return None
+
+        band = face_roi[top:bottom]
+        if self._band_blur is None or self._band_blur.shape != band.shape[:2]:
+            self._band_gray = np.empty(band.shape[:2], dtype=np.uint8)
+            self._band_blur = np.empty(band.shape[:2], dtype=np.uint8)
+        if band.ndim == 3:
+            band = cv2.cvtColor(band, cv2.COLOR_BGR2GRAY, dst=self._band_gray)
+        band = cv2.GaussianBlur(band, (5, 5), 0, dst=self._band_blur)
+
+        half = w // 2
+        _, _, left, _ = cv2.minMaxLoc(band[:, :half])
+        _, _, right, _ = cv2.minMaxLoc(band[:, half:])
+        return ((left[0], left[1] + top), (right[0] + half, right[1] + top))
+
+    def _detect_eye_centers_landmarks(self, frame: np.ndarray,
+                                      face_rect: Tuple[int, int, int, int]):
+        """
+        Locate both eye centers with YuNet landmarks.
 
-        # No eyes detected or insufficient data - return neutral gaze
-        return (0.0, 0.0)
+        Runs on the face box padded by 25% (YuNet needs some context around the
+        face) and returns ((left_x, left_y), (right_x, right_y)) in face_rect
+        coordinates, or None if no face was found.
+        """
+        x, y, w, h = face_rect
+        frame_h, frame_w = frame.shape[:2]
+        pad_x, pad_y = w // 4, h // 4
+        x0, y0 = max(0, x - pad_x), max(0, y - pad_y)
+        x1, y1 = min(frame_w, x + w + pad_x), min(frame_h, y + h + pad_y)
+        roi = frame[y0:y1, x0:x1]
+        if roi.size == 0:
+            return None
+
+        self.landmark_detector.setInputSize((roi.shape[1], roi.shape[0]))
+        _, faces = self.landmark_detector.detect(roi)
+        if faces is None or len(faces) == 0:
+            return None
+
+        # Row layout: x, y, w, h, right eye (x, y), left eye (x, y), ..., score
+        best = faces[np.argmax(faces[:, -1])]
+        eye_a = (int(best[4]) + x0 - x, int(best[5]) + y0 - y)
+        eye_b = (int(best[6]) + x0 - x, int(best[7]) + y0 - y)
+        return tuple(sorted((eye_a, eye_b)))
 
     def are_eyes_focused(self, gaze_x: float, gaze_y: float, threshold: float = 10.0) -> bool:
         """
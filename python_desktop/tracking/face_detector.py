@@ -1,10 +1,11 @@
 """
 Face detection using Haar Cascade and YOLO.
 """
+import threading
 import cv2
 import numpy as np
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 import config
 
 class FaceDetector:
@@ -19,9 +20,24 @@ class FaceDetector:
         """
         self.backend = backend
         self.haar_cascade: Optional[cv2.CascadeClassifier] = None
-        self.yolo_model = None  # Placeholder for YOLO model
+        self.haar_cascade_cuda = None  # cv2.cuda.CascadeClassifier, used when CUDA is available
+        self._small_frame: Optional[np.ndarray] = None  # Reused downscale buffer for Haar
+        self._small_gray: Optional[np.ndarray] = None  # Reused grayscale buffer for Haar
+        # Last Haar face; the next CPU detection searches a padded region around it
+        self._last_rect: Optional[Tuple[int, int, int, int]] = None
+        self._roi_detections = 0  # ROI-only detections since the last full-frame pass
+        self.yolo_model = None  # cv2.dnn.Net running the YOLOv5-face ONNX model
+        # Serializes detection: a cv2.dnn.Net (and the Haar search state) must not
+        # be used by BackgroundFaceDetector's thread and a caller at the same time
+        self._lock = threading.Lock()
         self.active_backend = None
 
+        # Transparent API: UMat inputs run cvtColor/detectMultiScale via OpenCL
+        self.use_opencl = config.USE_OPENCL and cv2.ocl.haveOpenCL()
+        if self.use_opencl:
+            cv2.ocl.setUseOpenCL(True)
+            print("OpenCL enabled for face detection")
+
         self._initialize_detectors()
 
     def _initialize_detectors(self):
@@ -44,6 +60,14 @@ class FaceDetector:
         else:
             self.active_backend = self.backend
 
+        # Bind the backend once; detect_face then calls it directly per frame
+        if self.active_backend == "yolo" and self.yolo_model is not None:
+            self._detect_impl = self._detect_face_yolo
+        elif self.active_backend == "haar" and self.haar_cascade is not None:
+            self._detect_impl = self._detect_face_haar
+        else:
+            self._detect_impl = self._detect_face_none
+
     def _initialize_haar(self):
         """Initialize Haar Cascade detector."""
         cascade_path = config.HAAR_CASCADE_PATH
@@ -56,6 +80,7 @@ class FaceDetector:
                 self.haar_cascade = None
             else:
                 print(f"Haar Cascade loaded from {cascade_path}")
+                self._initialize_haar_cuda()
                 return
 
         # Fallback: try OpenCV's built-in cascade
@@ -64,18 +89,74 @@ class FaceDetector:
             self.haar_cascade = cv2.CascadeClassifier(cascade_path)
             if not self.haar_cascade.empty():
                 print(f"Haar Cascade loaded from OpenCV: {cascade_path}")
+                self._initialize_haar_cuda()
             else:
                 self.haar_cascade = None
         except Exception as e:
             print(f"Warning: Failed to load Haar Cascade: {e}")
             self.haar_cascade = None
 
+    def _initialize_haar_cuda(self):
+        """
+        Load the CUDA Haar Cascade if OpenCV was built with CUDA and a device is present.
+
+        cv2.cuda.CascadeClassifier only reads the old cascade format, so this
+        loads config.HAAR_CUDA_CASCADE_PATH rather than the CPU cascade.
+        """
+        try:
+            if cv2.cuda.getCudaEnabledDeviceCount() == 0:
+                return
+        except (AttributeError, cv2.error):
+            return  # OpenCV built without CUDA
+
+        cascade_path = config.HAAR_CUDA_CASCADE_PATH
+        if not Path(cascade_path).exists():
+            print(f"Warning: CUDA Haar Cascade not found at {cascade_path}, using CPU")
+            return
+        try:
+            cascade = cv2.cuda.CascadeClassifier.create(cascade_path)
+        except cv2.error as e:
+            print(f"Warning: Failed to load CUDA Haar Cascade from {cascade_path}, using CPU: {e}")
+            return
+
+        cascade.setScaleFactor(1.1)
+        cascade.setMinNeighbors(5)
+        cascade.setMinObjectSize((30, 30))
+        self.haar_cascade_cuda = cascade
+
+        # Device buffers reused every frame (avoids a cudaMalloc per detection)
+        self._gpu_frame = cv2.cuda_GpuMat()
+        self._gpu_gray = cv2.cuda_GpuMat()
+        self._gpu_objects = cv2.cuda_GpuMat()
+        # Page-locked staging buffer (allocated on the first frame) and one
+        # stream, so upload, cvtColor and detection are queued back to back
+        self._pinned: Optional[np.ndarray] = None
+        self._stream = cv2.cuda_Stream()
+        print("Haar Cascade running on CUDA")
+
     def _initialize_yolo(self):
-        """Initialize YOLO detector (placeholder for now)."""
-        # TODO: Implement YOLO face detection using ultralytics
-        # For now, YOLO is not implemented
-        self.yolo_model = None
-        print("YOLO face detection not yet implemented")
+        """Initialize YOLO face detector from the exported ONNX model (OpenCV DNN)."""
+        model_path = config.YOLO_ONNX_PATH
+        if not Path(model_path).exists():
+            print(f"YOLO face model not found at {model_path}")
+            return
+
+        try:
+            net = cv2.dnn.readNetFromONNX(model_path)
+        except cv2.error as e:
+            print(f"Warning: Failed to load YOLO model: {e}")
+            return
+
+        # Prefer CUDA FP16, else OpenCV's CPU backend
+        try:
+            if cv2.cuda.getCudaEnabledDeviceCount() > 0:
+                net.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
+                net.setPreferableTarget(cv2.dnn.DNN_TARGET_CUDA_FP16)
+        except (AttributeError, cv2.error):
+            pass
+
+        self.yolo_model = net
+        print(f"YOLO face model loaded from {model_path}")
 
     def detect_face(self, frame: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
         """
@@ -90,41 +171,205 @@ class FaceDetector:
         if frame is None or frame.size == 0:
             return None
 
-        if self.active_backend == "yolo" and self.yolo_model is not None:
-            return self._detect_face_yolo(frame)
-        elif self.active_backend == "haar" and self.haar_cascade is not None:
-            return self._detect_face_haar(frame)
-        else:
-            return None
+        with self._lock:
+            return self._detect_impl(frame)
+
+    def _detect_face_none(self, frame: np.ndarray) -> None:
+        """No backend available."""
+        return None
 
     def _detect_face_haar(self, frame: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
         """Detect face using Haar Cascade."""
         if self.haar_cascade is None:
             return None
 
-        # Convert to grayscale for Haar Cascade
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.haar_cascade_cuda is not None:
+            faces = self._detect_faces_haar_cuda(frame)
+        else:
+            # Search around the previous face first; rescan the full frame
+            # when that fails and every HAAR_FULL_FRAME_INTERVAL detections
+            faces = ()
+            roi = self._search_roi(frame.shape)
+            if roi is not None:
+                rx, ry, rw, rh = roi
+                faces = self._detect_faces_haar_cpu(frame[ry:ry + rh, rx:rx + rw])
+                if len(faces) > 0:
+                    faces = np.asarray(faces) + (rx, ry, 0, 0)
+                self._roi_detections += 1
+            if len(faces) == 0:
+                faces = self._detect_faces_haar_cpu(frame)
+                self._roi_detections = 0
+
+        if len(faces) == 0:
+            self._last_rect = None
+            return None
+
+        # Return the largest face
+        faces = np.asarray(faces, dtype=np.int32).reshape(-1, 4)
+        largest_face = faces[np.argmax(faces[:, 2] * faces[:, 3])]
+        self._last_rect = tuple(int(v) for v in largest_face)
+        return self._last_rect
+
+    def _search_roi(self, frame_shape: Tuple[int, ...]) -> Optional[Tuple[int, int, int, int]]:
+        """Last face padded by half its size and clipped to the frame, or None for a full-frame pass."""
+        if self._last_rect is None or self._roi_detections >= config.HAAR_FULL_FRAME_INTERVAL:
+            return None
+        x, y, w, h = self._last_rect
+        pad = max(w, h) // 2
+        frame_h, frame_w = frame_shape[:2]
+        x0, y0 = max(0, x - pad), max(0, y - pad)
+        x1, y1 = min(frame_w, x + w + pad), min(frame_h, y + h + pad)
+        return (x0, y0, x1 - x0, y1 - y0)
+
+    def reset_search_state(self) -> Tuple[Optional[Tuple[int, int, int, int]], int]:
+        """Forget the previous face so the next detection scans the full frame; returns the old state."""
+        with self._lock:
+            state = (self._last_rect, self._roi_detections)
+            self._last_rect, self._roi_detections = None, 0
+        return state
+
+    def restore_search_state(self, state: Tuple[Optional[Tuple[int, int, int, int]], int]):
+        """Put back state returned by reset_search_state()."""
+        with self._lock:
+            self._last_rect, self._roi_detections = state
+
+    def _detect_faces_haar_cuda(self, frame: np.ndarray):
+        """Run the Haar Cascade on the GPU; the frame is uploaded once and stays on device."""
+        if self._pinned is None or self._pinned.shape != frame.shape:
+            # A NumPy array pinned in place: HostMem.createMatHeader() would hand
+            # back a pageable copy, since cv2 copies Mats NumPy did not allocate
+            if self._pinned is not None:
+                cv2.cuda.unregisterPageLocked(self._pinned)
+            self._pinned = np.empty(frame.shape, dtype=np.uint8)
+            cv2.cuda.registerPageLocked(self._pinned)
+
+        # Uploads from pinned memory are a direct DMA instead of a staged pageable copy
+        np.copyto(self._pinned, frame)
+        self._gpu_frame.upload(self._pinned, self._stream)
+        cv2.cuda.cvtColor(self._gpu_frame, cv2.COLOR_BGR2GRAY, dst=self._gpu_gray, stream=self._stream)
+        self._gpu_objects = self.haar_cascade_cuda.detectMultiScale(
+            self._gpu_gray, self._gpu_objects, self._stream
+        )
+        self._stream.waitForCompletion()  # Only the detections are read back
+        faces = self.haar_cascade_cuda.convert(self._gpu_objects)
+        return faces if faces is not None else ()
+
+    def _detect_faces_haar_cpu(self, frame: np.ndarray):
+        """Run the Haar Cascade on the CPU (through OpenCL when enabled)."""
+        # Downscale first: cascade cost is roughly linear in pixel count
+        height, width = frame.shape[:2]
+        scale = min(1.0, config.HAAR_DETECT_WIDTH / width)
+        size = (round(width * scale), round(height * scale))
+
+        # Convert to grayscale for Haar Cascade (on the OpenCL device if enabled;
+        # only the face rectangles come back to the host)
+        if self.use_opencl:
+            small = cv2.UMat(frame)
+            if scale < 1.0:
+                small = cv2.resize(small, size, interpolation=cv2.INTER_AREA)
+        elif scale < 1.0:
+            if self._small_frame is None or self._small_frame.shape[:2] != (size[1], size[0]):
+                self._small_frame = np.empty((size[1], size[0], 3), dtype=np.uint8)
+            small = cv2.resize(frame, size, dst=self._small_frame, interpolation=cv2.INTER_AREA)
+        else:
+            small = frame
+
+        if self.use_opencl:
+            gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        else:
+            if self._small_gray is None or self._small_gray.shape != small.shape[:2]:
+                self._small_gray = np.empty(small.shape[:2], dtype=np.uint8)
+            gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=self._small_gray)
 
         # Detect faces
+        min_size = max(1, round(30 * scale))
         faces = self.haar_cascade.detectMultiScale(
             gray,
             scaleFactor=1.1,
             minNeighbors=5,
-            minSize=(30, 30)
+            minSize=(min_size, min_size)
         )
 
-        if len(faces) == 0:
+        # Scale rectangles back to frame coordinates
+        if scale < 1.0 and len(faces) > 0:
+            faces = np.round(faces / scale).astype(int)
+        return faces
+
+    def _detect_face_yolo(self, frame: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """Detect face using YOLOv5-face (ONNX via OpenCV DNN)."""
+        if self.yolo_model is None:
             return None
 
-        # Return the largest face
-        largest_face = max(faces, key=lambda rect: rect[2] * rect[3])
-        return tuple(largest_face)
+        height, width = frame.shape[:2]
+        size = config.YOLO_INPUT_SIZE
+        blob = cv2.dnn.blobFromImage(frame, 1 / 255.0, (size, size), swapRB=True)
+        self.yolo_model.setInput(blob)
 
-    def _detect_face_yolo(self, frame: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
-        """Detect face using YOLO (placeholder)."""
-        # TODO: Implement YOLO face detection
+        return self._largest_yolo_face(self.yolo_model.forward()[0], width, height)
+
+    def _largest_yolo_face(self, predictions: np.ndarray, width: int,
+                           height: int) -> Optional[Tuple[int, int, int, int]]:
+        """Threshold + NMS one image's YOLO predictions; return the largest face in frame pixels."""
+        size = config.YOLO_INPUT_SIZE
+
+        # Rows: cx, cy, w, h, objectness, 5 landmarks (x, y), face class score
+        scores = predictions[:, 4] * predictions[:, 15]
+        keep = scores > config.YOLO_CONF_THRESHOLD
+        if not keep.any():
+            return None
+
+        # Center boxes in network pixels -> top-left boxes in frame pixels
+        boxes = predictions[keep, :4].copy()
+        boxes[:, :2] -= boxes[:, 2:] / 2
+        boxes *= (width / size, height / size, width / size, height / size)
+        scores = scores[keep]
+
+        indices = cv2.dnn.NMSBoxes(boxes.tolist(), scores.tolist(),
+                                   config.YOLO_CONF_THRESHOLD, config.YOLO_NMS_THRESHOLD)
+        if len(indices) == 0:
+            return None
+
+        # Return the largest face, clamped to the frame; boxes near the edges
+        # can extend past it and would otherwise yield an empty face ROI
+        faces = boxes[np.asarray(indices).flatten()]
+        x, y, w, h = faces[np.argmax(faces[:, 2] * faces[:, 3])]
+        x0, y0 = max(0, int(x)), max(0, int(y))
+        x1, y1 = min(width, int(x + w)), min(height, int(y + h))
+        if x1 > x0 and y1 > y0:
+            return (x0, y0, x1 - x0, y1 - y0)
         return None
 
+    def detect_faces_batch(self, frames: List[np.ndarray]) -> List[Optional[Tuple[int, int, int, int]]]:
+        """
+        Detect the largest face in each of several frames (offline/clip processing).
+
+        With the YOLO backend all frames go through one batched forward pass,
+        which needs an ONNX model exported with a dynamic batch axis; other
+        backends and fixed-batch models fall back to one detect_face per frame.
+
+        Args:
+            frames: Input frames (BGR format)
+
+        Returns:
+            One face rectangle (x, y, width, height) or None per frame
+        """
+        if self.active_backend == "yolo" and self.yolo_model is not None and len(frames) > 1:
+            size = config.YOLO_INPUT_SIZE
+            blob = cv2.dnn.blobFromImages(frames, 1 / 255.0, (size, size), swapRB=True)
+            try:
+                with self._lock:
+                    self.yolo_model.setInput(blob)
+                    batch_predictions = self.yolo_model.forward()
+            except cv2.error:
+                pass  # Model has a fixed batch size of 1
+            else:
+                return [
+                    self._largest_yolo_face(predictions, frame.shape[1], frame.shape[0])
+                    for predictions, frame in zip(batch_predictions, frames)
+                ]
+
+        return [self.detect_face(frame) for frame in frames]
+
     def draw_face_box(self, frame: np.ndarray, face_rect: Tuple[int, int, int, int],
                      color: Tuple[int, int, int] = (0, 255, 0), thickness: int = 2):
         """
@@ -143,3 +388,74 @@ class FaceDetector:
         """Get center point of face rectangle."""
         x, y, w, h = face_rect
         return (x + w // 2, y + h // 2)
+
+
+class BackgroundFaceDetector:
+    """
+    Runs a FaceDetector on its own thread at the detector's natural rate.
+
+    submit() hands a frame over only while the detector is idle (frames that
+    arrive during inference are dropped); latest() returns the newest result
+    with a sequence number, so callers can tell fresh detections from reused ones.
+    """
+
+    def __init__(self, detector: FaceDetector):
+        self.detector = detector
+        self._cond = threading.Condition()
+        self._buffer: Optional[np.ndarray] = None  # Private copy of the frame being detected
+        self._pending = False
+        self._busy = False
+        self._result: Tuple[int, Optional[Tuple[int, int, int, int]]] = (0, None)
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the detection thread."""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the detection thread and wait for it to finish."""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, frame: np.ndarray):
+        """Queue frame for detection if the detector is idle; otherwise drop it."""
+        with self._cond:
+            if self._busy or self._pending:
+                return
+            # Copy: the caller's buffer is reused before inference finishes
+            if self._buffer is None or self._buffer.shape != frame.shape:
+                self._buffer = np.empty_like(frame)
+            np.copyto(self._buffer, frame)
+            self._pending = True
+            self._cond.notify()
+
+    def latest(self) -> Tuple[int, Optional[Tuple[int, int, int, int]]]:
+        """Return (sequence number, face rectangle or None) of the newest detection."""
+        with self._cond:
+            return self._result
+
+    def _run(self):
+        """Detection loop: wait for a submitted frame, detect, publish."""
+        sequence = 0
+        while True:
+            with self._cond:
+                while self._running and not self._pending:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                self._pending = False
+                self._busy = True
+
+            face_rect = self.detector.detect_face(self._buffer)
+            sequence += 1
+
+            with self._cond:
+                self._result = (sequence, face_rect)
+                self._busy = False
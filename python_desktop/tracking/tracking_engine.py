@@ -1,21 +1,52 @@
 """
 Main tracking engine that coordinates camera, face detection, and eye tracking.
 """
+import time
 import cv2
 import numpy as np
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 import config
 from models import TrackingResult
+from models.tracking_result import FRAME_RESULT_DTYPE
 from .camera import CameraCapture
-from .face_detector import FaceDetector
+from .face_detector import BackgroundFaceDetector, FaceDetector
 from .eye_tracker import EyeTracker
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the kernel then runs as plain Python
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# KCF tracker factory (opencv-contrib-python); without it the detector runs every frame
+_create_kcf_tracker = getattr(cv2, "TrackerKCF_create", None)
+
+@njit(cache=True)
+def _moved_beyond(prev_x, prev_y, curr_x, curr_y, threshold_sq) -> bool:
+    """True if (prev -> curr) is longer than the threshold (compared squared, no sqrt)."""
+    dx = curr_x - prev_x
+    dy = curr_y - prev_y
+    return dx * dx + dy * dy > threshold_sq
+
 class TrackingEngine:
     """
     Main tracking engine coordinating all CV operations.
     Matches the functionality of the C++ TrackingEngine.
     """
 
+    HUD_HEIGHT = 120  # pixels
+    HUD_REFRESH_INTERVAL = 0.1  # seconds between HUD text re-renders
+
+    # HUD text settings
+    HUD_FONT = cv2.FONT_HERSHEY_SIMPLEX
+    HUD_FONT_SCALE = 0.6
+    HUD_THICKNESS = 1
+    HUD_LINE_HEIGHT = 25
+    HUD_BASELINE = 18  # Baseline row within a line-high label sprite
+    HUD_X_OFFSET = 10
+
     def __init__(self):
         self.camera = CameraCapture()
         self.face_detector = FaceDetector(backend=config.FACE_DETECTOR_BACKEND)
@@ -25,6 +56,17 @@ class TrackingEngine:
         self.is_tracking = False
         self.calibrated = False
 
+        # When False (headless/batch use), process_frame skips the display copy
+        # and all overlay drawing and returns None for the frame
+        self.enable_visualization = True
+        self._display_buf: Optional[np.ndarray] = None
+
+        # Cached HUD text layer, re-rendered at most every HUD_REFRESH_INTERVAL
+        self._hud_text: Optional[np.ndarray] = None
+        self._hud_mask: Optional[np.ndarray] = None
+        self._hud_last_ts = 0.0
+        self._label_sprites = {}  # (label, color) -> prerendered label sprite
+
         # Camera parameters for distance calculation
         self.focal_length = config.FOCAL_LENGTH
         self.average_face_width_cm = config.AVERAGE_FACE_WIDTH_CM
@@ -32,11 +74,26 @@ class TrackingEngine:
         # Movement detection state
         self.previous_face_center: Optional[Tuple[int, int]] = None
         self.movement_threshold = 10  # pixels
+        self._movement_threshold_sq = self.movement_threshold ** 2
+
+        # Tracker-assisted detection: the detector runs on keyframes only
+        self._face_tracker = None
+        self._frames_since_detect = 0
+
+        # Slow (YOLO) detection can run on its own thread while tracking
+        self._background_detector: Optional[BackgroundFaceDetector] = None
+        self._background_seq = 0
+        self._background_rect: Optional[Tuple[int, int, int, int]] = None
+        if _create_kcf_tracker is None:
+            print("KCF tracker unavailable (needs opencv-contrib-python), detecting every frame")
 
         print("TrackingEngine initialized")
 
     def initialize(self) -> bool:
         """Initialize the tracking engine and camera."""
+        # Compile the movement kernel now rather than on the first tracked frame
+        _moved_beyond(0, 0, 0, 0, self._movement_threshold_sq)
+
         success = self.camera.start()
         if success:
             print("TrackingEngine ready")
@@ -45,11 +102,22 @@ class TrackingEngine:
     def start_tracking(self):
         """Start tracking."""
         self.is_tracking = True
+        if (config.FACE_DETECT_IN_BACKGROUND and self._background_detector is None
+                and self.face_detector.active_backend == "yolo"
+                and self.face_detector.yolo_model is not None):
+            self._background_detector = BackgroundFaceDetector(self.face_detector)
+            self._background_detector.start()
         print("Tracking started")
 
     def stop_tracking(self):
         """Stop tracking."""
         self.is_tracking = False
+        self._face_tracker = None
+        if self._background_detector is not None:
+            self._background_detector.stop()
+            self._background_detector = None
+            self._background_seq = 0
+            self._background_rect = None
         print("Tracking stopped")
 
     def shutdown(self):
@@ -66,7 +134,9 @@ class TrackingEngine:
             frame: Optional frame to process. If None, reads from camera.
 
         Returns:
-            Tuple of (TrackingResult, processed_frame)
+            Tuple of (TrackingResult, processed_frame). processed_frame is None
+            when enable_visualization is off; otherwise it is a buffer reused
+            by the next call, so copy it if it must outlive that.
         """
         # Read frame from camera if not provided
         if frame is None:
@@ -77,35 +147,20 @@ class TrackingEngine:
             if not success or frame is None:
                 return TrackingResult.empty(), None
 
-        # Create a copy for visualization
-        display_frame = frame.copy()
-
-        # Detect face
-        face_rect = self.face_detector.detect_face(frame)
-
-        if face_rect is None:
+        # Copy into the reusable display buffer (overlays must not touch frame,
+        # which detection and gaze estimation still read)
+        display_frame = None
+        if self.enable_visualization:
+            if self._display_buf is None or self._display_buf.shape != frame.shape:
+                self._display_buf = np.empty_like(frame)
+            display_frame = self._display_buf
+            np.copyto(display_frame, frame)
+
+        values = self._track(frame, display_frame)
+        if values is None:
             # No face detected
-            self.previous_face_center = None
             return TrackingResult.empty(), display_frame
-
-        x, y, w, h = face_rect
-
-        # Draw face box on display frame
-        self.face_detector.draw_face_box(display_frame, face_rect)
-
-        # Calculate face distance
-        face_distance = self.calculate_face_distance(w)
-
-        # Estimate gaze
-        gaze_x, gaze_y = self.eye_tracker.estimate_gaze(frame, face_rect)
-
-        # Check if eyes are focused
-        eyes_focused = self.eye_tracker.are_eyes_focused(gaze_x, gaze_y)
-
-        # Detect head movement
-        face_center = self.face_detector.get_face_center(face_rect)
-        head_moving = self.detect_movement(face_center)
-        self.previous_face_center = face_center
+        (x, y, w, h), face_distance, gaze_x, gaze_y, eyes_focused, head_moving = values
 
         # Create tracking result
         result = TrackingResult(
@@ -124,10 +179,152 @@ class TrackingEngine:
         )
 
         # Draw tracking info on display frame
-        self._draw_tracking_info(display_frame, result)
+        if display_frame is not None:
+            self._draw_tracking_info(display_frame, result)
 
         return result, display_frame
 
+    def process_frames(self, frames: List[np.ndarray]) -> np.ndarray:
+        """
+        Track a sequence of frames (e.g. a recorded clip) without visualization.
+
+        Results are written into one FRAME_RESULT_DTYPE array instead of a
+        TrackingResult object per frame, so a whole clip can be filtered or
+        reduced with NumPy afterwards.
+
+        Args:
+            frames: Frames in capture order (BGR format)
+
+        Returns:
+            Structured array with one row per frame (all zero where no face was found)
+        """
+        results = np.zeros(len(frames), dtype=FRAME_RESULT_DTYPE)
+
+        # The clip is unrelated to the live stream: track it from fresh
+        # movement/tracker/detector state and put the live state back afterwards
+        live_state = (self.previous_face_center, self._face_tracker, self._frames_since_detect)
+        detector_state = self.face_detector.reset_search_state()
+        self.previous_face_center, self._face_tracker, self._frames_since_detect = None, None, 0
+        try:
+            for i, frame in enumerate(frames):
+                # Offline frames must be detected synchronously: the background
+                # detector's results belong to the live camera stream
+                values = self._track(frame, None, background=False)
+                if values is not None:
+                    results[i] = (True, *values)
+        finally:
+            self.previous_face_center, self._face_tracker, self._frames_since_detect = live_state
+            self.face_detector.restore_search_state(detector_state)
+        return results
+
+    def _track(self, frame: np.ndarray, display_frame: Optional[np.ndarray],
+               background: bool = True):
+        """
+        Run face location, distance, gaze and movement on one frame.
+
+        Args:
+            frame: Frame to track (BGR format)
+            display_frame: Copy to draw the face box on, or None
+            background: Use the background face detector when it is running
+
+        Returns:
+            (face_rect, face_distance, gaze_x, gaze_y, eyes_focused, head_moving),
+            or None if no face was found
+        """
+        # Detect face (or follow it with the tracker between keyframes)
+        face_rect = self._locate_face(frame, background)
+
+        if face_rect is None:
+            self.previous_face_center = None
+            return None
+
+        # The box drawing, distance and center below inline draw_face_box,
+        # calculate_face_distance and get_face_center (same math, fewer calls)
+        x, y, w, h = face_rect
+
+        # Draw face box on display frame
+        if display_frame is not None:
+            cv2.rectangle(display_frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+
+        # Calculate face distance (pinhole model)
+        face_distance = (self.average_face_width_cm * self.focal_length) / w if w > 0 else 0.0
+
+        # Estimate gaze
+        gaze_x, gaze_y = self.eye_tracker.estimate_gaze(frame, face_rect)
+
+        # Check if eyes are focused
+        eyes_focused = self.eye_tracker.are_eyes_focused(gaze_x, gaze_y)
+
+        # Detect head movement
+        face_center = (x + w // 2, y + h // 2)
+        head_moving = self.detect_movement(face_center)
+        self.previous_face_center = face_center
+
+        return face_rect, face_distance, gaze_x, gaze_y, eyes_focused, head_moving
+
+    def _locate_face(self, frame: np.ndarray,
+                     background: bool = True) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Find the face box: KCF tracker update between keyframes, the face
+        detector every FACE_REDETECT_INTERVAL frames or when tracking is lost
+        (or, with a background detector and background=True, whenever it
+        has a new result).
+        """
+        if background and self._background_detector is not None:
+            return self._locate_face_background(frame)
+
+        if self._face_tracker is not None and self._frames_since_detect < config.FACE_REDETECT_INTERVAL:
+            self._frames_since_detect += 1
+            face_rect = self._update_face_tracker(frame)
+            if face_rect is not None:
+                return face_rect
+
+        self._frames_since_detect = 0
+        face_rect = self.face_detector.detect_face(frame)
+        self._start_face_tracker(frame, face_rect)
+        return face_rect
+
+    def _locate_face_background(self, frame: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """
+        Find the face box while the detector runs on its background thread:
+        the newest detection when one arrives, else the KCF tracker (or the
+        last detection as-is) so every frame gets a box at camera rate.
+        """
+        self._background_detector.submit(frame)
+        sequence, face_rect = self._background_detector.latest()
+        if sequence != self._background_seq:
+            # Fresh detection (from a slightly older frame); re-seed the tracker on this one
+            self._background_seq = sequence
+            self._background_rect = face_rect
+            self._start_face_tracker(frame, face_rect)
+            return face_rect
+
+        if self._face_tracker is not None:
+            face_rect = self._update_face_tracker(frame)
+            if face_rect is not None:
+                return face_rect
+        return self._background_rect
+
+    def _start_face_tracker(self, frame: np.ndarray, face_rect: Optional[Tuple[int, int, int, int]]):
+        """(Re)initialize the KCF tracker on face_rect, or clear it when there is no face."""
+        self._face_tracker = None
+        if face_rect is not None and _create_kcf_tracker is not None:
+            self._face_tracker = _create_kcf_tracker()
+            self._face_tracker.init(frame, tuple(int(v) for v in face_rect))
+
+    def _update_face_tracker(self, frame: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """Advance the KCF tracker; returns its box clamped to the frame, or None if lost."""
+        ok, (x, y, w, h) = self._face_tracker.update(frame)
+        if not ok:
+            return None
+        # Clamp to the frame; the tracker box can drift past the edges
+        frame_h, frame_w = frame.shape[:2]
+        x0, y0 = max(0, int(x)), max(0, int(y))
+        x1, y1 = min(frame_w, int(x + w)), min(frame_h, int(y + h))
+        if x1 > x0 and y1 > y0:
+            return (x0, y0, x1 - x0, y1 - y0)
+        return None
+
     def calculate_face_distance(self, face_width_pixels: int) -> float:
         """
         Calculate distance from camera to face in cm.
@@ -146,6 +343,38 @@ class TrackingEngine:
         distance_cm = (self.average_face_width_cm * self.focal_length) / face_width_pixels
         return distance_cm
 
+    def calculate_face_distances(self, face_widths_pixels: np.ndarray) -> np.ndarray:
+        """
+        Vectorized calculate_face_distance for many faces or a clip of frames.
+
+        Args:
+            face_widths_pixels: Face widths in pixels (any shape)
+
+        Returns:
+            Distances in cm, 0.0 where the width is not positive
+        """
+        widths = np.asarray(face_widths_pixels, dtype=np.float64)
+        distances = (self.average_face_width_cm * self.focal_length) / np.maximum(widths, 1.0)
+        return np.where(widths > 0, distances, 0.0)
+
+    def detect_movements(self, face_centers: np.ndarray) -> np.ndarray:
+        """
+        Vectorized detect_movement over a sequence of face centers.
+
+        Args:
+            face_centers: (N, 2) array of face centers (x, y), one per frame
+
+        Returns:
+            (N,) boolean array; element i is True if frame i moved more than the
+            threshold since frame i - 1 (the first frame is never moving)
+        """
+        centers = np.asarray(face_centers, dtype=np.int64).reshape(-1, 2)
+        moving = np.zeros(len(centers), dtype=bool)
+        # Squared distances against the squared threshold: no sqrt needed
+        steps_sq = (np.diff(centers, axis=0) ** 2).sum(axis=1)
+        moving[1:] = steps_sq > self.movement_threshold ** 2
+        return moving
+
     def detect_movement(self, current_center: Tuple[int, int]) -> bool:
         """
         Detect if face/head has moved significantly.
@@ -162,46 +391,71 @@ class TrackingEngine:
         prev_x, prev_y = self.previous_face_center
         curr_x, curr_y = current_center
 
-        distance = np.sqrt((curr_x - prev_x)**2 + (curr_y - prev_y)**2)
-        return distance > self.movement_threshold
+        return _moved_beyond(prev_x, prev_y, curr_x, curr_y, self._movement_threshold_sq)
 
     def _draw_tracking_info(self, frame: np.ndarray, result: TrackingResult):
         """Draw tracking information on frame."""
-        h, w = frame.shape[:2]
-
-        # Draw info panel background
-        info_bg_height = 120
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (0, 0), (w, info_bg_height), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.5, frame, 0.5, 0, frame)
-
-        # Text settings
-        font = cv2.FONT_HERSHEY_SIMPLEX
-        font_scale = 0.6
-        color = (255, 255, 255)
-        thickness = 1
-        line_height = 25
-        x_offset = 10
-
-        # Display tracking metrics
+        # Info panel: darken the top band in place (same as a 50% black blend,
+        # without a full-frame overlay copy) and stamp the cached text on it
+        band = frame[:self.HUD_HEIGHT]
+        now = time.monotonic()
+        if (self._hud_text is None or self._hud_text.shape != band.shape
+                or now - self._hud_last_ts >= self.HUD_REFRESH_INTERVAL):
+            self._render_hud(band.shape, result)
+            self._hud_last_ts = now
+
+        band >>= 1
+        np.copyto(band, self._hud_text, where=self._hud_mask)
+
+    def _render_hud(self, shape: Tuple[int, ...], result: TrackingResult):
+        """Render the HUD text onto a black band and cache it with its pixel mask."""
+        if self._hud_text is None or self._hud_text.shape != shape:
+            self._hud_text = np.zeros(shape, dtype=np.uint8)
+            self._hud_mask = np.empty((shape[0], shape[1], 1), dtype=bool)
+        text = self._hud_text
+        text.fill(0)
+        white = (255, 255, 255)
+
+        # Display tracking metrics (static prefixes come from cached sprites)
         y_pos = 25
-        cv2.putText(frame, f"Distance: {result.face_distance:.1f} cm",
-                   (x_offset, y_pos), font, font_scale, color, thickness)
+        self._draw_hud_line(text, y_pos, "Distance: ", f"{result.face_distance:.1f} cm", white)
 
-        y_pos += line_height
-        cv2.putText(frame, f"Gaze X: {result.gaze_angle_x:.1f}deg  Y: {result.gaze_angle_y:.1f}deg",
-                   (x_offset, y_pos), font, font_scale, color, thickness)
+        y_pos += self.HUD_LINE_HEIGHT
+        self._draw_hud_line(text, y_pos, "Gaze X: ",
+                            f"{result.gaze_angle_x:.1f}deg  Y: {result.gaze_angle_y:.1f}deg", white)
 
-        y_pos += line_height
-        status_text = "Eyes: "
-        status_text += "FOCUSED" if result.eyes_focused else "NOT FOCUSED"
+        y_pos += self.HUD_LINE_HEIGHT
         status_color = (0, 255, 0) if result.eyes_focused else (0, 0, 255)
-        cv2.putText(frame, status_text, (x_offset, y_pos), font, font_scale, status_color, thickness)
-
-        y_pos += line_height
-        movement_text = "Movement: "
-        movement_text += "YES" if result.head_moving else "NO"
-        cv2.putText(frame, movement_text, (x_offset, y_pos), font, font_scale, color, thickness)
+        self._draw_hud_line(text, y_pos, "Eyes: ",
+                            "FOCUSED" if result.eyes_focused else "NOT FOCUSED", status_color)
+
+        y_pos += self.HUD_LINE_HEIGHT
+        self._draw_hud_line(text, y_pos, "Movement: ", "YES" if result.head_moving else "NO", white)
+
+        np.any(text, axis=2, keepdims=True, out=self._hud_mask)
+
+    def _draw_hud_line(self, text: np.ndarray, y_pos: int, prefix: str, value: str,
+                       color: Tuple[int, int, int]):
+        """Blit the prerendered prefix sprite at baseline y_pos, then rasterize only the value."""
+        sprite = self._label_sprites.get((prefix, color))
+        if sprite is None:
+            sprite = self._label_sprites[(prefix, color)] = self._render_label_sprite(prefix, color)
+
+        top = y_pos - self.HUD_BASELINE
+        x = self.HUD_X_OFFSET
+        target = text[top:top + sprite.shape[0], x:x + sprite.shape[1]]
+        target[...] = sprite[:target.shape[0], :target.shape[1]]
+
+        cv2.putText(text, value, (x + sprite.shape[1], y_pos),
+                    self.HUD_FONT, self.HUD_FONT_SCALE, color, self.HUD_THICKNESS)
+
+    def _render_label_sprite(self, label: str, color: Tuple[int, int, int]) -> np.ndarray:
+        """Rasterize a static HUD label once; its width is the label's text advance."""
+        (width, _), _ = cv2.getTextSize(label, self.HUD_FONT, self.HUD_FONT_SCALE, self.HUD_THICKNESS)
+        sprite = np.zeros((self.HUD_LINE_HEIGHT, width, 3), dtype=np.uint8)
+        cv2.putText(sprite, label, (0, self.HUD_BASELINE),
+                    self.HUD_FONT, self.HUD_FONT_SCALE, color, self.HUD_THICKNESS)
+        return sprite
 
     def start_calibration(self):
         """Start calibration process."""